@@ -1,148 +1,305 @@
 import os
 import json
-from datetime import datetime
+import time
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
-from openai import OpenAI
-from ddgs import DDGS
+from clients import get_openai_client, get_async_openai_client
+from llm_gateway import get_gateway
+from tokens import fit_to_budget, message_tokens
+from summarizer import Summarizer, summary_message
+from tool_cache import ToolCache
+from tool_registry import registry
+import tools  # noqa: F401  (registers the tools)
 
 # Load env variables once at the top
 load_dotenv()
 
+# Tool calls from one turn run in parallel on this shared, bounded pool
+TOOL_WORKERS = 8
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+# Timeout for a tool the registry doesn't know (its call fails fast anyway)
+DEFAULT_TOOL_TIMEOUT = 10
+# Longest a call may wait for a free slot of a tool with max_concurrency before giving up
+TOOL_QUEUE_TIMEOUT = 30
+
+# Results are reused for each tool's cache_ttl (see tools.py), across agents/users.
+# Set TOOL_CACHE_DB=path/to/tool_cache.sqlite3 to keep results across restarts
+tool_cache = ToolCache(
+    ttls={t.name: t.cache_ttl for t in registry},
+    max_entries=2048,
+    db_path=os.environ.get("TOOL_CACHE_DB"),
+)
+
+MODEL = "gpt-4o-mini"
+# Plan -> tools rounds before the model is forced to answer
+MAX_TOOL_STEPS = 5
+
 class AIAgent:
-    def __init__(self):
+    def __init__(self, max_context_tokens=4000, summarize=True):
         """
         Initialize the Agent. 
         This is like the constructor in a React class component.
         We set up the API client and the initial state (memory).
+        `max_context_tokens` caps how much history is sent (and kept) per turn.
+        With `summarize`, older turns are folded into a running summary instead
+        of being dropped once the history gets long.
         """
-        self.client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        self.max_context_tokens = max_context_tokens
+        # Process-wide pooled clients: every agent shares the same connections
+        self.client = get_openai_client()
+        # Used by astream_turn() (the FastAPI server)
+        self.async_client = get_async_openai_client()
         self.messages = [
             {"role": "system", "content": "You are a helpful AI assistant."}
         ]
+
+        # Rolling summary: computed in a background thread between turns
+        self.summarizer = None
+        if summarize:
+            self.summarizer = Summarizer(
+                self.client,
+                trigger_tokens=max_context_tokens // 2,
+                keep_recent_tokens=max_context_tokens // 4,
+            )
+        self.summary = ""
+        self._summary_job = None  # (future, messages being folded)
+        self._executor = ThreadPoolExecutor(max_workers=1)
         
-        # Define the tools schema (configuration)
-        self.tools_schema = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_current_time",
-                    "description": "Get the current date and time.",
-                },
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_weather",
-                    "description": "Get current weather.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "location": {"type": "string", "description": "City name"},
-                        },
-                        "required": ["location"],
-                    },
-                },
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_internet",
-                    "description": "Search the internet for facts.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {"type": "string", "description": "The search query"},
-                        },
-                        "required": ["query"],
-                    },
-                },
-            }
-        ]
+        # Tool schemas are built once from the functions in tools.py
+        self.tools_schema = registry.schemas()
 
-    # --- Tool Logic (Private Methods) ---
-    def _get_current_time(self):
-        now = datetime.now()
-        return json.dumps({"current_time": now.strftime("%Y-%m-%d %H:%M:%S")})
-
-    def _get_weather(self, location):
-        # Mock data for demo
-        weather_data = {
-            "rabat": "22°C, Sunny",
-            "london": "15°C, Rainy",
-            "paris": "18°C, Cloudy"
-        }
-        key = location.lower().split(",")[0].strip()
-        result = weather_data.get(key, "Unknown weather data")
-        return json.dumps({"location": location, "weather": result})
-
-    def _search_internet(self, query):
-        print(f"   🔎 Internal Search: '{query}'...")
+    # --- Tool Execution ---
+    def _run_tool(self, fname, arguments):
+        """Parses the arguments and serves the result from the tool cache when possible"""
+        args = json.loads(arguments or "{}")
+        return tool_cache.get_or_call(fname, args, lambda: registry.call(fname, args))
+
+    def _submit_tools(self, tool_calls):
+        """
+        Starts every tool call of a turn: on the tool's own executor when it
+        limits its concurrency, else on the shared pool. Returns (name,
+        timeout, future, started) per call; `started` resolves to the time the
+        call actually began running.
+        """
+        calls = []
+        for tool_call in tool_calls:
+            fname, arguments = tool_call["function"]["name"], tool_call["function"]["arguments"]
+            print(f"   🤖 Agent is using tool: {fname}")
+            tool = registry.get(fname)
+            started = Future()
+
+            def run(fname=fname, arguments=arguments, started=started):
+                started.set_result(time.monotonic())
+                return self._run_tool(fname, arguments)
+            pool = tool.executor if tool and tool.executor else _tool_pool
+            timeout = tool.timeout if tool else DEFAULT_TOOL_TIMEOUT
+            calls.append((fname, timeout, pool.submit(run), started))
+        return calls
+
+    def _run_tools(self, tool_calls):
+        """
+        Runs all tool calls of one turn in parallel and returns their results
+        in the original call order. A turn now takes as long as its slowest tool.
+        A tool that overruns its timeout gets an error result; its thread is
+        left to finish in the background (threads can't be killed).
+        """
+        results = []
+        for fname, timeout, future, started in self._submit_tools(tool_calls):
+            try:
+                # A call waiting for a slot isn't timed yet: its clock starts when it runs
+                try:
+                    began = started.result(timeout=TOOL_QUEUE_TIMEOUT)
+                except FutureTimeout:
+                    if future.cancel():
+                        results.append(f"Error: {fname} is busy, try again later")
+                        continue
+                    began = started.result()  # it got a slot just now
+                result = future.result(timeout=max(0, began + timeout - time.monotonic()))
+            except FutureTimeout:
+                future.cancel()
+                result = f"Error: {fname} timed out after {timeout}s"
+            except Exception as e:
+                result = f"Error: {fname} failed: {e}"
+            results.append(result)
+        return results
+
+    async def _arun_tools(self, tool_calls):
+        """
+        _run_tools() for the event loop: the tool futures are awaited, so no
+        thread of the loop's default executor is parked while tools run.
+        """
+        async def result_of(fname, timeout, future, started):
+            try:
+                try:
+                    # Shielded: giving up on the wait must not cancel `started` under the tool
+                    began = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(started)), TOOL_QUEUE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    if future.cancel():
+                        return f"Error: {fname} is busy, try again later"
+                    began = await asyncio.wrap_future(started)
+                return await asyncio.wait_for(asyncio.wrap_future(future), max(0, began + timeout - time.monotonic()))
+            except asyncio.TimeoutError:
+                future.cancel()
+                return f"Error: {fname} timed out after {timeout}s"
+            except Exception as e:
+                return f"Error: {fname} failed: {e}"
+        return await asyncio.gather(*[result_of(*call) for call in self._submit_tools(tool_calls)])
+
+    # --- Memory ---
+    def _trim_memory(self):
+        """Keeps the system prompt + the newest messages that fit the token budget"""
+        system, history = self.messages[0], self.messages[1:]
+        budget = self.max_context_tokens - message_tokens(system)
+        if self.summary:
+            budget -= message_tokens(summary_message(self.summary))
+        self.messages = [system] + fit_to_budget(history, budget)
+
+    def _prompt(self):
+        """What is actually sent: system prompt, running summary, recent messages"""
+        if not self.summary:
+            return list(self.messages)
+        return [self.messages[0], summary_message(self.summary)] + self.messages[1:]
+
+    def _apply_summary(self):
+        """Swaps folded messages for the new summary, if the background job is done"""
+        if self._summary_job is None or not self._summary_job[0].done():
+            return
+        future, folded = self._summary_job
+        self._summary_job = None
         try:
-            results = DDGS().text(query, max_results=3)
-            if not results: return "No results found."
-            summary = ""
-            for r in results:
-                summary += f"- {r['title']}: {r['body']}\n"
-            return summary
+            self.summary = future.result()
         except Exception as e:
-            return f"Search error: {e}"
+            print(f"Summary error: {e}")
+            return
+        folded_ids = {id(m) for m in folded}
+        self.messages = [m for m in self.messages if id(m) not in folded_ids]
+
+    def _schedule_summary(self):
+        """Starts folding older turns in the background once the history is long enough"""
+        if self.summarizer is None or self._summary_job is not None:
+            return
+        parts = self.summarizer.split(self.messages[1:])
+        if parts is None:
+            return
+        older = parts[0]
+        future = self._executor.submit(self.summarizer.summarize, self.summary, older)
+        self._summary_job = (future, older)
+
+    # --- The Agent Loop ---
+    def _request(self, messages, step, max_steps):
+        """Arguments for one streamed completion; the last step can't call tools"""
+        kwargs = {"model": MODEL, "messages": messages, "stream": True}
+        if step < max_steps:
+            kwargs["tools"] = self.tools_schema
+            kwargs["tool_choice"] = "auto"
+        return kwargs
+
+    @staticmethod
+    def _merge_tool_deltas(calls, deltas):
+        """Tool calls arrive in fragments while streaming; glue them back together by index"""
+        for delta in deltas:
+            call = calls.setdefault(delta.index, {
+                "id": None, "type": "function", "function": {"name": "", "arguments": ""},
+            })
+            if delta.id:
+                call["id"] = delta.id
+            if delta.function:
+                if delta.function.name:
+                    call["function"]["name"] += delta.function.name
+                if delta.function.arguments:
+                    call["function"]["arguments"] += delta.function.arguments
+
+    @staticmethod
+    def _end_step(messages, content, calls):
+        """Records one model step. Returns the tool calls to run (empty when it answered)"""
+        tool_calls = [calls[i] for i in sorted(calls)]
+        if not tool_calls:
+            messages.append({"role": "assistant", "content": content})
+            return []
+        messages.append({"role": "assistant", "content": content or None, "tool_calls": tool_calls})
+        return tool_calls
+
+    @staticmethod
+    def _add_tool_results(messages, tool_calls, results):
+        for tool_call, result in zip(tool_calls, results):
+            messages.append({
+                "tool_call_id": tool_call["id"],
+                "role": "tool",
+                "name": tool_call["function"]["name"],
+                "content": str(result),
+            })
+
+    def stream_turn(self, messages, max_steps=MAX_TOOL_STEPS):
+        """
+        Runs plan -> tools -> plan ... -> answer on `messages` and yields the
+        answer's tokens as they arrive. Every step is streamed, so when the
+        model answers directly the first token goes out immediately.
+        `messages` is extended in place with the tool calls, results and answer.
+        """
+        for step in range(1, max_steps + 1):
+            # Through the gateway: transient errors are retried before the first token
+            stream = get_gateway().create(self.client, **self._request(messages, step, max_steps))
+            content, calls = "", {}
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.tool_calls:
+                    self._merge_tool_deltas(calls, delta.tool_calls)
+                if delta.content:
+                    content += delta.content
+                    yield delta.content
+            tool_calls = self._end_step(messages, content, calls)
+            if not tool_calls:
+                return
+            self._add_tool_results(messages, tool_calls, self._run_tools(tool_calls))
+
+    async def astream_turn(self, messages, max_steps=MAX_TOOL_STEPS):
+        """Async version of stream_turn() for the server (tools run on their pools; results are awaited)"""
+        for step in range(1, max_steps + 1):
+            # Retried before the first token, and hedged when that token is late (LLM_HEDGE=1)
+            stream = await get_gateway().acreate(self.async_client, **self._request(messages, step, max_steps))
+            content, calls = "", {}
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.tool_calls:
+                    self._merge_tool_deltas(calls, delta.tool_calls)
+                if delta.content:
+                    content += delta.content
+                    yield delta.content
+            tool_calls = self._end_step(messages, content, calls)
+            if not tool_calls:
+                return
+            results = await self._arun_tools(tool_calls)
+            self._add_tool_results(messages, tool_calls, results)
 
     # --- The Main Logic ---
-    def chat(self, user_input):
+    def chat_stream(self, user_input):
         """
         This method receives text, handles the thinking,
-        runs tools if needed, and returns the final string.
+        runs tools if needed, and yields the final answer token by token.
         """
         # 1. Update State
         self.messages.append({"role": "user", "content": user_input})
+        self._apply_summary()
+        self._trim_memory()
 
-        # 2. First API Call (Think/Plan)
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=self.messages,
-            tools=self.tools_schema,
-            tool_choice="auto",
-        )
-        msg = response.choices[0].message
-        tool_calls = msg.tool_calls
-
-        if tool_calls:
-            self.messages.append(msg) # Save the plan to history
-            
-            # 3. Execute Tools
-            for tool_call in tool_calls:
-                fname = tool_call.function.name
-                args = json.loads(tool_call.function.arguments)
-                
-                print(f"   🤖 Agent is using tool: {fname}")
-                
-                result = "Error"
-                if fname == "get_current_time":
-                    result = self._get_current_time()
-                elif fname == "get_weather":
-                    result = self._get_weather(args["location"])
-                elif fname == "search_internet":
-                    result = self._search_internet(args["query"])
-                
-                self.messages.append({
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "name": fname,
-                    "content": str(result),
-                })
-
-            # 4. Second API Call (Final Answer)
-            final_resp = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=self.messages
-            )
-            ai_reply = final_resp.choices[0].message.content
-        else:
-            ai_reply = msg.content
+        # 2. Think -> use tools -> ... -> answer (streamed)
+        prompt = self._prompt()
+        start = len(prompt)
+        yield from self.stream_turn(prompt)
 
-        # 5. Final State Update & Return
-        self.messages.append({"role": "assistant", "content": ai_reply})
-        return ai_reply
+        # 3. Final State Update: keep the tool calls, results and answer of this turn
+        self.messages.extend(prompt[start:])
+        self._schedule_summary()
+
+    def chat(self, user_input):
+        """Same as chat_stream(), but returns the final string"""
+        return "".join(self.chat_stream(user_input))
 
 # --- Execution Block ---
 # This only runs if you run this specific file.
@@ -156,6 +313,8 @@ if __name__ == "__main__":
         if u_in.lower() in ["exit", "quit"]:
             break
         
-        # Notice how clean the main loop is now:
-        response = my_agent.chat(u_in)
-        print(f"AI: {response}")
\ No newline at end of file
+        # Notice how clean the main loop is now (tokens are printed as they arrive):
+        print("AI: ", end="", flush=True)
+        for token in my_agent.chat_stream(u_in):
+            print(token, end="", flush=True)
+        print()
\ No newline at end of file
@@ -0,0 +1,240 @@
+import time
+import json
+import argparse
+import numpy as np
+from vector_index import normalize, BLOCK_ROWS
+
+
+def kmeans(vectors, k, iters=15, sample=None, spherical=True, seed=0):
+    """
+    Lloyd's k-means on (a sample of) `vectors`. Returns (k, dim) float32 centroids.
+    spherical=True assigns by inner product and keeps centroids unit length
+    (for normalized embeddings); False is plain Euclidean (PQ codebooks).
+    """
+    rng = np.random.default_rng(seed)
+    if sample and len(vectors) > sample:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample, replace=False))]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), k, replace=len(vectors) < k)].copy()
+    for _ in range(iters):
+        labels = assign(vectors, centroids, spherical)
+        # Per-cluster sums: sort rows by cluster, then one reduceat (np.add.at is slow)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=k)
+        present = counts > 0
+        sums = np.zeros_like(centroids)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[present]
+        sums[present] = np.add.reduceat(vectors[order], starts, axis=0)
+        empty = ~present
+        # Reseed empty clusters with random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        counts[empty] = 1
+        centroids = sums / counts[:, None]
+        if spherical:
+            centroids = normalize(centroids)
+    return centroids
+
+
+def assign(vectors, centroids, spherical=True):
+    """Nearest centroid per vector, in row blocks"""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    half_norms = None if spherical else 0.5 * (centroids ** 2).sum(axis=1)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        scores = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32) @ centroids.T
+        if half_norms is not None:
+            scores -= half_norms  # argmax(x.c - |c|^2/2) = argmin |x - c|^2
+        labels[start:start + BLOCK_ROWS] = scores.argmax(axis=1)
+    return labels
+
+
+def recall_at_k(approx_ids, exact_ids):
+    """Mean fraction of the exact top-k found by the approximate search"""
+    hits = [len(set(a) & set(e)) / len(e) for a, e in zip(approx_ids, exact_ids) if len(e)]
+    return float(np.mean(hits)) if hits else 0.0
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour search for corpora too large for brute force.
+
+    Inverted file: k-means splits the vectors into `nlist` clusters, each
+    cluster's rows are stored contiguously, and a query only scores the
+    `nprobe` clusters whose centroids are closest (nprobe trades recall for
+    latency at query time). With `pq_m`, rows are stored as product-quantized
+    residuals (pq_m bytes per vector instead of 4 * dim) and scored with
+    per-query lookup tables; `rerank` > 0 also keeps the float32 vectors and
+    re-scores that many PQ candidates exactly.
+    """
+    def __init__(self, nlist=256, pq_m=None, nprobe=8, rerank=0):
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.nprobe = nprobe
+        self.rerank = rerank if pq_m else 0
+        self.centroids = None   # (nlist, dim)
+        self.codebooks = None   # (pq_m, 256, dim / pq_m)
+        self.ids = np.zeros(0, dtype=object)
+        self.data = None        # rows sorted by list: float32 vectors or uint8 PQ codes
+        self.offsets = None     # list i = rows offsets[i]:offsets[i + 1]
+        self.vectors = None     # float32 rows (same order as data), only for rerank
+
+    def train(self, vectors, sample=65536, iters=15):
+        vectors = normalize(vectors)
+        self.centroids = kmeans(vectors, self.nlist, iters, sample)
+        if self.pq_m:
+            dim = vectors.shape[1]
+            if dim % self.pq_m:
+                raise ValueError(f"pq_m={self.pq_m} must divide the dimension {dim}")
+            rng = np.random.default_rng(0)
+            train = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)]
+            residuals = train - self.centroids[assign(train, self.centroids)]
+            sub = dim // self.pq_m
+            self.codebooks = np.stack([
+                kmeans(residuals[:, j * sub:(j + 1) * sub], 256, iters, spherical=False, seed=j)
+                for j in range(self.pq_m)
+            ])
+        return self
+
+    def _encode(self, vectors, labels):
+        residuals = vectors - self.centroids[labels]
+        sub = residuals.shape[1] // self.pq_m
+        codes = np.empty((len(vectors), self.pq_m), dtype=np.uint8)
+        for j in range(self.pq_m):
+            codes[:, j] = assign(residuals[:, j * sub:(j + 1) * sub], self.codebooks[j], spherical=False)
+        return codes
+
+    def add(self, ids, vectors):
+        """Adds vectors (train() first). Rows are re-sorted by list, so add in large batches"""
+        vectors = normalize(vectors)
+        labels = assign(vectors, self.centroids)
+        rows = self._encode(vectors, labels) if self.pq_m else vectors
+        full = vectors if self.rerank else None
+        if self.data is not None:
+            old_labels = np.repeat(np.arange(self.nlist), np.diff(self.offsets))
+            labels = np.concatenate([old_labels, labels])
+            rows = np.concatenate([self.data, rows])
+            ids = np.concatenate([self.ids, np.asarray(ids, dtype=object)])
+            if full is not None:
+                full = np.concatenate([self.vectors, full])
+        order = np.argsort(labels, kind="stable")
+        self.data = np.ascontiguousarray(rows[order])
+        if full is not None:
+            self.vectors = np.ascontiguousarray(full[order])
+        self.ids = np.asarray(ids, dtype=object)[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=self.nlist))])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k=5, nprobe=None):
+        return self.search_batch([query], k, nprobe)[0]
+
+    def search_batch(self, queries, k=5, nprobe=None):
+        """[(id, score), ...] best first, for each query (score ~ cosine similarity)"""
+        queries = normalize(queries)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for q, lists, c_scores in zip(queries, probes, centroid_scores):
+            if self.pq_m:
+                sub = len(q) // self.pq_m
+                # Lookup table: q . codeword for every sub-space and code
+                lut = np.einsum("jd,jcd->jc", q.reshape(self.pq_m, sub), self.codebooks)
+            rows, scores = [], []
+            for lst in lists:
+                start, stop = self.offsets[lst], self.offsets[lst + 1]
+                if start == stop:
+                    continue
+                if self.pq_m:
+                    codes = self.data[start:stop]
+                    scores.append(c_scores[lst] + lut[np.arange(self.pq_m), codes].sum(axis=1))
+                else:
+                    scores.append(self.data[start:stop] @ q)
+                rows.append(np.arange(start, stop))
+            if not rows:
+                results.append([])
+                continue
+            rows, scores = np.concatenate(rows), np.concatenate(scores)
+            if self.vectors is not None:
+                # Exact re-scoring of the best PQ candidates (never fewer than k)
+                candidates = min(max(k, self.rerank), len(scores))
+                keep = np.argpartition(-scores, candidates - 1)[:candidates]
+                rows, scores = rows[keep], self.vectors[rows[keep]] @ q
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append([(self.ids[rows[i]], float(scores[i])) for i in top])
+        return results
+
+    # --- Persistence: one .npz ---
+    def save(self, path):
+        config = {"nlist": self.nlist, "pq_m": self.pq_m, "nprobe": self.nprobe, "rerank": self.rerank}
+        np.savez(path, centroids=self.centroids, codebooks=self.codebooks if self.pq_m else np.zeros(0),
+                 data=self.data, offsets=self.offsets, ids=np.asarray(json.dumps(self.ids.tolist())),
+                 vectors=self.vectors if self.vectors is not None else np.zeros(0),
+                 config=np.asarray(json.dumps(config)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path if str(path).endswith(".npz") else f"{path}.npz") as f:
+            index = cls(**json.loads(str(f["config"])))
+            index.centroids = f["centroids"]
+            index.codebooks = f["codebooks"] if index.pq_m else None
+            index.data = f["data"]
+            index.offsets = f["offsets"]
+            index.vectors = f["vectors"] if index.rerank else None
+            index.ids = np.asarray(json.loads(str(f["ids"])), dtype=object)
+        return index
+
+
+def build_from_collection(collection, nlist=None, pq_m=None, rerank=0, page=5000):
+    """Trains and fills an IVFIndex from every embedding of a Chroma/LocalVectorStore collection"""
+    ids, vectors = [], []
+    offset = 0
+    while True:
+        batch = collection.get(limit=page, offset=offset, include=["embeddings"])
+        if not batch["ids"]:
+            break
+        ids.extend(batch["ids"])
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+    if not ids:
+        raise ValueError("Collection is empty")
+    vectors = np.concatenate(vectors)
+    # Rule of thumb: ~sqrt(n) lists
+    index = IVFIndex(nlist=nlist or max(1, int(np.sqrt(len(ids)))), pq_m=pq_m, rerank=rerank)
+    index.train(vectors)
+    index.add(ids, vectors)
+    return index, vectors
+
+
+if __name__ == "__main__":
+    # Offline build from the knowledge base (Chroma, or VECTOR_STORE=local)
+    from dotenv import load_dotenv
+    from vector_store import get_collection
+    from vector_index import VectorIndex
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build an IVF index from the knowledge_base collection")
+    parser.add_argument("--out", default="ann_index.npz")
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--pq-m", type=int, help="PQ sub-spaces (bytes per vector); omit for flat lists")
+    parser.add_argument("--rerank", type=int, default=0, help="PQ candidates re-scored exactly")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index, vectors = build_from_collection(get_collection(), args.nlist, args.pq_m, args.rerank)
+    print(f"Built IVF index: {len(index)} vectors, nlist={index.nlist}, pq_m={index.pq_m} "
+          f"in {time.perf_counter() - start:.1f}s")
+    index.save(args.out)
+
+    # Recall@k against exact search, using stored vectors as queries
+    exact = VectorIndex()
+    exact.add(list(index.ids), vectors)
+    sample = vectors[np.random.default_rng(0).choice(len(vectors), min(100, len(vectors)), replace=False)]
+    truth = [[i for i, _ in r] for r in exact.search_batch(sample, args.k)]
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        if nprobe > index.nlist:
+            break
+        found = [[i for i, _ in r] for r in index.search_batch(sample, args.k, nprobe)]
+        print(f"nprobe={nprobe:<3} recall@{args.k}={recall_at_k(found, truth):.3f}")
@@ -1,91 +1,268 @@
 import os
-from fastapi import FastAPI
+import time
+import uuid
+import asyncio
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from agent_class import AIAgent
+from agent_class import AIAgent, tool_cache
+from llm_gateway import get_gateway
+from tool_registry import registry
+import clients
+from message_log import MessageLog
+from history_cache import HistoryCache
+from tokens import fit_to_budget, message_tokens
+from summarizer import Summarizer, ConversationSummaries, summary_message
+from semantic_cache import SemanticCache, context_digest, stream_answer
+from embeddings import get_service as get_embedding_service, get_batcher, get_embedding, aget_embedding
+from vector_store import get_collection, get_lexical_index
+from retrieval import HybridRetriever
+from rerank import get_reranker
+from rag import RagPipeline, RAG_TOP_K, rag_messages, format_sources
 
 load_dotenv()
 
 # --- 1. SETUP DATABASE ---
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+# Shared pooled client (HTTP/2, keep-alive); SUPABASE_FAKE=1 gives in-memory tables for
+# offline runs (local dev, benchmarks)
+supabase = clients.get_supabase_client()
 
-app = FastAPI()
+# Write-behind queue: messages are bulk-inserted in the background
+message_log = MessageLog(supabase, table="messages")
+
+# Prompt size is capped by tokens, not by message count, so long sessions stay cheap
+HISTORY_TOKEN_BUDGET = 3000
+# Most messages ever considered for one context window (and kept per cached conversation)
+HISTORY_MAX_MESSAGES = 50
+
+# Recent messages per conversation, kept warm by save_message()
+history_cache = HistoryCache(max_conversations=1000, max_messages=HISTORY_MAX_MESSAGES)
+
+# RAG: the knowledge base (vectors + BM25 index) is opened once, at startup
+rag_pipeline = None
+
+def open_rag_pipeline():
+    collection = get_collection("knowledge_base")
+    lexical = get_lexical_index("knowledge_base")
+    retriever = HybridRetriever(collection, lexical, get_embedding, aembed=embed_text)
+    # Cross-encoder with RERANK_MODEL_DIR, otherwise MMR over the stored embeddings
+    return RagPipeline(retriever, get_reranker(collection))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global rag_pipeline
+    message_log.start()
+    try:
+        rag_pipeline = await asyncio.to_thread(open_rag_pipeline)
+    except Exception as e:
+        print(f"RAG disabled, knowledge base unavailable: {e}")
+    yield
+    # Drain pending messages before the process exits
+    await message_log.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Conversation-Id"],
 )
 
 agent = AIAgent()
 
+# Older turns are folded into a per-conversation running summary (in the background)
+summaries = ConversationSummaries(
+    Summarizer(agent.client, trigger_tokens=HISTORY_TOKEN_BUDGET // 2,
+               keep_recent_tokens=HISTORY_TOKEN_BUDGET // 4),
+    db=supabase,
+)
+
+async def embed_text(text: str):
+    # Shared content-addressed cache: a repeated prompt is never embedded twice.
+    # Misses from concurrent requests are micro-batched into one upstream call.
+    return await aget_embedding(text)
+
+# Optional: reuse answers for near-duplicate prompts (SEMANTIC_CACHE=1)
+semantic_cache = None
+if os.environ.get("SEMANTIC_CACHE") == "1":
+    semantic_cache = SemanticCache(
+        embed_text,
+        threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        ttl=float(os.environ.get("SEMANTIC_CACHE_TTL", "3600")),
+    )
+
+SYSTEM_PROMPT = {"role": "system", "content": "You are a helpful assistant. You must answer in Arabic (or Darija) so the text-to-speech engine can read your response correctly."}
+
 class ChatRequest(BaseModel):
     prompt: str
+    # Omit to start a new conversation; the id is returned in the X-Conversation-Id header
+    conversation_id: Optional[str] = None
+
+class RagRequest(BaseModel):
+    prompt: str
+    # Chunks kept after reranking (before packing into the context budget)
+    k: int = RAG_TOP_K
 
 # --- 2. HELPER FUNCTIONS ---
-def save_message(role: str, content: str):
-    """Saves a message to Supabase"""
-    try:
-        supabase.table("messages").insert({"role": role, "content": content}).execute()
-    except Exception as e:
-        print(f"Error saving to DB: {e}")
+async def save_message(conversation_id: str, role: str, content: str):
+    """Queues a message for the next bulk insert (see MessageLog)"""
+    message = {"conversation_id": conversation_id, "role": role, "content": content}
+    history_cache.append(conversation_id, message)
+    await message_log.write(message)
 
-def get_recent_history(limit=5):
-    """Fetches the last N messages to give the AI context"""
+def get_recent_history(conversation_id: str, limit=HISTORY_MAX_MESSAGES):
+    """
+    Fetches the last N messages of a conversation to give the AI context.
+    Returns (messages, position of the first one in the conversation).
+    """
     try:
-        # Get last N messages (ordered by newest first)
-        response = supabase.table("messages").select("*").order("id", desc=True).limit(limit).execute()
+        # Get last N messages (ordered by newest first), and how many there are in total
+        response = (
+            supabase.table("messages").select("*", count="exact")
+            .eq("conversation_id", conversation_id)
+            .order("id", desc=True).limit(limit).execute()
+        )
         # Reverse them so they are in chronological order (Oldest -> Newest)
         history = response.data[::-1]
-        
+
         # Format for OpenAI (needs 'role' and 'content')
         formatted_history = [{"role": msg["role"], "content": msg["content"]} for msg in history]
-        return formatted_history
+        return formatted_history, (response.count or len(history)) - len(history)
     except Exception as e:
         print(f"Error fetching history: {e}")
-        return []
+        return [], 0
+
+async def get_recent_history_async(conversation_id: str, limit=HISTORY_MAX_MESSAGES):
+    """Serves history (and its start position) from the cache; falls back to Supabase on a miss or cold start"""
+    cached = history_cache.get(conversation_id, limit)
+    if cached is not None:
+        return cached
+    # Load more than asked so the next turns are hits too
+    fetch = max(limit, history_cache.max_messages)
+    history, start = await asyncio.to_thread(get_recent_history, conversation_id, fetch)
+    history_cache.fill(conversation_id, history, start=start, complete=len(history) < fetch)
+    window = history[-limit:] if limit else []
+    return window, start + len(history) - len(window)
+
+async def get_summary_async(conversation_id: str):
+    """Makes sure the conversation's summary is in memory (DB read only on a miss)"""
+    if not summaries.is_loaded(conversation_id):
+        await asyncio.to_thread(summaries.load, conversation_id)
+
+def build_context(history: list, summary: Optional[str] = None):
+    """System prompt + running summary + the newest messages that fit in HISTORY_TOKEN_BUDGET"""
+    head = [SYSTEM_PROMPT] + ([summary_message(summary)] if summary else [])
+    budget = HISTORY_TOKEN_BUDGET - sum(message_tokens(m) for m in head)
+    return head + fit_to_budget(history, budget)
 
 # --- 3. THE SMART GENERATOR ---
-def response_generator(user_prompt: str):
-    
-    # A. Save User Message to DB
-    save_message("user", user_prompt)
-
-    # B. Fetch History (So it remembers previous chats)
-    history = get_recent_history()
-    
-    # C. Add System Prompt
-    system_instruction = {"role": "system", "content": "You are a helpful assistant. You must answer in Arabic (or Darija) so the text-to-speech engine can read your response correctly."}
-    messages = [system_instruction] + history 
-
-    # D. Call OpenAI²
-    stream = agent.client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        stream=True,
-    )
+async def response_generator(conversation_id: str, user_prompt: str):
 
-    # E. Stream & Accumulate
+    # A. Fetch History (So it remembers previous chats)
+    # Read before saving the prompt: it is appended locally, and warms the cache first.
+    # The prompt embedding for the semantic cache is fetched at the same time.
+    lookups = [get_recent_history_async(conversation_id), get_summary_async(conversation_id)]
+    if semantic_cache:
+        lookups.append(semantic_cache.embed_prompt(user_prompt))
+    (history, start), _, *embedding = await asyncio.gather(*lookups)
+    digest = context_digest(history)
+    history.append({"role": "user", "content": user_prompt})
+
+    # B. Save User Message to DB (only queued; the write happens in the background)
+    await save_message(conversation_id, "user", user_prompt)
+
+    # C. Add System Prompt + summary, and cut the unsummarized history to the token budget
+    summary, recent = summaries.apply(conversation_id, history, start)
+    messages = build_context(recent, summary)
+
+    # D. Run the agent loop (tools if needed), streaming the final answer
+    # AsyncOpenAI underneath: the event loop drives the stream, no threadpool worker is held.
+    # On a semantic cache hit the stored answer is replayed instead.
+    vector = embedding[0] if embedding else None
+    cached = semantic_cache.lookup(vector, digest) if vector is not None else None
     full_response = ""
-    for chunk in stream:
-        if chunk.choices[0].delta.content:
-            text_chunk = chunk.choices[0].delta.content
+    if cached is not None:
+        for text_chunk in stream_answer(cached):
+            full_response += text_chunk
+            yield text_chunk
+    else:
+        t0, prompt_size = time.perf_counter(), len(messages)
+        async for text_chunk in agent.astream_turn(messages):
             full_response += text_chunk
             yield text_chunk
+        # Answers built from tool results (time, weather, search) go stale: don't reuse them
+        used_tools = any(m.get("role") == "tool" for m in messages[prompt_size:])
+        if vector is not None and not used_tools:
+            semantic_cache.store(vector, digest, user_prompt, full_response, time.perf_counter() - t0)
+
+    # E. Save AI Response to DB (After stream finishes)
+    await save_message(conversation_id, "assistant", full_response)
+
+    # F. Fold older turns into the summary, off the request path (not awaited), on the summary pool
+    history.append({"role": "assistant", "content": full_response})
+    summaries.fold_later(conversation_id, history, start)
 
-    # F. Save AI Response to DB (After stream finishes)
-    save_message("assistant", full_response)
+
+async def rag_generator(question: str, context: str, sources: list):
+    """Streams the answer to a knowledge-base question, then the cited sources"""
+    if not sources:
+        yield "I don't know: nothing relevant was found in the knowledge base."
+        return
+    # One step, no tools: the answer must come from the packed context
+    async for text_chunk in agent.astream_turn(rag_messages(question, context), max_steps=1):
+        yield text_chunk
+    yield format_sources(sources)
 
 
 @app.post("/chat")
-def chat_endpoint(request: ChatRequest):
-    return StreamingResponse(response_generator(request.prompt), media_type="text/plain")
+async def chat_endpoint(request: ChatRequest):
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    return StreamingResponse(
+        response_generator(conversation_id, request.prompt),
+        media_type="text/plain",
+        headers={"X-Conversation-Id": conversation_id},
+    )
+
+@app.post("/rag")
+async def rag_endpoint(request: RagRequest):
+    if rag_pipeline is None:
+        raise HTTPException(status_code=503, detail="Knowledge base unavailable")
+    # Query embedding goes through the shared cache: a repeated question skips the API call
+    context, sources, timings = await rag_pipeline.arun(request.prompt, k=request.k)
+    return StreamingResponse(
+        rag_generator(request.prompt, context, sources),
+        media_type="text/plain",
+        headers={"X-Retrieval-Ms": f"{timings['total']:.1f}"},
+    )
+
+@app.post("/cache/invalidate")
+def invalidate_cache():
+    """Drops every cached answer (e.g. after the knowledge behind them changed)"""
+    if semantic_cache:
+        semantic_cache.invalidate()
+    return {"status": "ok"}
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "message_log": message_log.stats(),
+        "history_cache": history_cache.stats(),
+        "summaries": summaries.stats(),
+        "tool_cache": tool_cache.stats(),
+        "tools": registry.stats(),
+        "llm": get_gateway().stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "embeddings": get_embedding_service().stats(),
+        "embedding_batcher": get_batcher().stats() if get_batcher() else None,
+        "http_pools": clients.stats(),
+        "rag": rag_pipeline.stats() if rag_pipeline else None,
+    }
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,99 @@
+"""
+Recall/latency trade-off of the IVF index vs exact search.
+
+Synthetic clustered embeddings (a mixture of Gaussians, closer to real
+embeddings than uniform noise). For IVF-flat, IVF-PQ and IVF-PQ with exact
+re-ranking, sweeps nprobe and reports recall@k against exact VectorIndex
+search, per-query latency and index memory, then draws recall against
+latency as a text chart.
+
+Usage (from the project root):
+    python -m benchmarks.ann_recall --vectors 200000 --dim 256
+"""
+import time
+import argparse
+import numpy as np
+
+from vector_index import VectorIndex, normalize
+from ann_index import IVFIndex, recall_at_k
+
+
+def clustered(n, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, n)]
+    vectors += 0.6 * rng.standard_normal((n, dim), dtype=np.float32)
+    return normalize(vectors)
+
+
+def per_query(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def chart(rows, width=50):
+    """One bar per run: bar length = recall, label = latency"""
+    lines = []
+    for name, nprobe, recall, latency_ms in rows:
+        bar = "#" * int(round(recall * width))
+        lines.append(f"{name:<14}{nprobe:>4} |{bar:<{width}}| {recall:.2f} @ {latency_ms:.2f} ms")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=2000, help="clusters in the synthetic data")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, help="default: sqrt(vectors)")
+    parser.add_argument("--pq-m", type=int, help="PQ sub-spaces (default dim / 8)")
+    parser.add_argument("--rerank", type=int, default=100)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    vectors = clustered(args.vectors, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+    ids = list(range(len(vectors)))
+
+    exact = VectorIndex()
+    exact.add(ids, vectors)
+    truth = [[i for i, _ in r] for r in exact.search_batch(queries, args.k)]
+    exact_ms = per_query(lambda q: exact.search(q, args.k), queries[:50]) * 1e3
+    print(f"{args.vectors} vectors x {args.dim} dims, k={args.k}; exact search {exact_ms:.2f} ms/query, "
+          f"{exact.matrix.nbytes / 1e6:.0f} MB\n")
+
+    nlist = args.nlist or int(np.sqrt(args.vectors))
+    pq_m = args.pq_m or args.dim // 8
+    configs = {
+        "ivf-flat": IVFIndex(nlist=nlist),
+        f"ivf-pq{pq_m}": IVFIndex(nlist=nlist, pq_m=pq_m),
+        f"ivf-pq{pq_m}+rr": IVFIndex(nlist=nlist, pq_m=pq_m, rerank=args.rerank),
+    }
+    print(f"{'index':<14}{'nprobe':>7}{'recall':>8}{'ms/query':>10}{'speedup':>9}{'build':>8}{'memory':>9}")
+    rows = []
+    for name, index in configs.items():
+        start = time.perf_counter()
+        index.train(vectors)
+        index.add(ids, vectors)
+        build_s = time.perf_counter() - start
+        memory = index.data.nbytes + (index.vectors.nbytes if index.vectors is not None else 0)
+        for nprobe in args.nprobe:
+            if nprobe > nlist:
+                break
+            found = [[i for i, _ in r] for r in index.search_batch(queries, args.k, nprobe)]
+            recall = recall_at_k(found, truth)
+            ms = per_query(lambda q: index.search(q, args.k, nprobe), queries[:50]) * 1e3
+            rows.append((name, nprobe, recall, ms))
+            print(f"{name:<14}{nprobe:>7}{recall:>8.3f}{ms:>10.2f}{exact_ms / ms:>8.1f}x"
+                  f"{build_s:>7.1f}s{memory / 1e6:>6.0f} MB")
+    print("\nrecall@k vs latency\n" + chart(rows))
+
+
+if __name__ == "__main__":
+    main()
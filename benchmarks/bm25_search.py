@@ -0,0 +1,83 @@
+"""
+BM25 lexical lookup latency at knowledge-base scale, offline.
+
+Builds a BM25Index over a synthetic corpus (Zipf-distributed vocabulary, so
+a few words are in most chunks and most words are rare) in which every
+chunk also carries a unique invoice-style id. Reports build time and
+p50/p95/p99 lookup latency for exact-id queries, rare-term queries and
+common-word queries, and how often an exact-id query returns its chunk
+first - the case dense embeddings handle worst.
+
+Usage (from the project root):
+    python -m benchmarks.bm25_search --chunks 1000000
+"""
+import time
+import argparse
+import numpy as np
+
+from bm25 import BM25Index
+
+
+def corpus(n, words_per_chunk, vocab, seed=0):
+    """Yields (chunk_id, text) with Zipfian words and one unique id per chunk"""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocab)])
+    for start in range(0, n, 10_000):
+        count = min(10_000, n - start)
+        ranks = np.minimum(rng.zipf(1.2, (count, words_per_chunk)) - 1, vocab - 1)
+        for i, row in enumerate(ranks):
+            j = start + i
+            yield f"doc_{j}", f"Invoice INV-{j:07d}: " + " ".join(words[row])
+
+
+def percentiles(fn, queries):
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        fn(q)
+        latencies.append(time.perf_counter() - t)
+    return [float(np.percentile(latencies, p) * 1e3) for p in (50, 95, 99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--words", type=int, default=60, help="words per chunk")
+    parser.add_argument("--vocab", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--max-postings", type=int, default=1000)
+    args = parser.parse_args()
+
+    index = BM25Index(max_postings=args.max_postings)
+    start = time.perf_counter()
+    ids, texts = [], []
+    for chunk_id, text in corpus(args.chunks, args.words, args.vocab):
+        ids.append(chunk_id)
+        texts.append(text)
+        if len(ids) == 10_000:
+            index.add(ids, texts)
+            ids, texts = [], []
+    index.add(ids, texts)
+    index.merge()
+    build_s = time.perf_counter() - start
+    print(f"{args.chunks} chunks x {args.words} words, vocab {args.vocab}: built in {build_s:.1f}s "
+          f"({args.chunks / build_s:.0f} chunks/s), {len(index._docs)} postings\n")
+
+    rng = np.random.default_rng(1)
+    targets = rng.integers(0, args.chunks, args.queries)
+    id_queries = [f"what is the total of INV-{j:07d}" for j in targets]
+    rare_queries = [f"w{a} w{b}" for a, b in rng.integers(args.vocab // 2, args.vocab, (args.queries, 2))]
+    common_queries = [f"w{a} w{b} w{c}" for a, b, c in rng.integers(0, 20, (args.queries, 3))]
+
+    print(f"{'queries':<10}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, queries in (("exact id", id_queries), ("rare", rare_queries), ("common", common_queries)):
+        p50, p95, p99 = percentiles(lambda q: index.search(q, args.k), queries)
+        print(f"{name:<10}{p50:>6.3f} ms{p95:>6.3f} ms{p99:>6.3f} ms")
+
+    hits = sum(index.search(q, 1)[0][0] == f"doc_{j}" for q, j in zip(id_queries, targets))
+    print(f"\nexact-id queries answered by the right chunk at rank 1: {hits / args.queries:.1%}")
+
+
+if __name__ == "__main__":
+    main()
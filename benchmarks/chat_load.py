@@ -0,0 +1,123 @@
+"""
+Load test for the /chat endpoint.
+
+By default it runs fully offline: the FastAPI app is driven in-process through
+httpx's ASGI transport, OpenAI is replaced by a fake stream that sleeps between
+tokens and Supabase is the in-memory FakeSupabaseClient (SUPABASE_FAKE=1). The interesting number is the peak count
+of upstream streams that were open at the same time: with the async pipeline it
+should reach --concurrency, well above the Starlette threadpool size (40).
+
+Usage (from the project root):
+    python -m benchmarks.chat_load --concurrency 300
+    python -m benchmarks.chat_load --url http://127.0.0.1:8000 --concurrency 100
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+from types import SimpleNamespace
+
+import anyio
+import httpx
+
+# Dummy credentials so api.py can be imported without a .env file
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("SUPABASE_FAKE", "1")
+
+
+class FakeStream:
+    """Async iterator that mimics an OpenAI chat completion stream"""
+    def __init__(self, stats, tokens, delay):
+        self.stats = stats
+        self.tokens = tokens
+        self.delay = delay
+
+    def __aiter__(self):
+        return self._run()
+
+    async def _run(self):
+        self.stats["open"] += 1
+        self.stats["peak"] = max(self.stats["peak"], self.stats["open"])
+        try:
+            for i in range(self.tokens):
+                await asyncio.sleep(self.delay)
+                delta = SimpleNamespace(content=f"tok{i} ", tool_calls=None)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+        finally:
+            self.stats["open"] -= 1
+
+
+class FakeAsyncOpenAI:
+    def __init__(self, tokens, delay):
+        self.stats = {"open": 0, "peak": 0}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.tokens = tokens
+        self.delay = delay
+
+    async def _create(self, **kwargs):
+        return FakeStream(self.stats, self.tokens, self.delay)
+
+
+async def one_request(client, url, i):
+    start = time.perf_counter()
+    # A few messages per conversation, so history is served from the cache
+    body = {"prompt": f"load test message {i}", "conversation_id": f"load-{i % 50}"}
+    resp = await client.post(url, json=body)
+    resp.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(args):
+    fake = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        import api
+        fake = FakeAsyncOpenAI(args.tokens, args.token_delay)
+        api.agent.async_client = fake
+        api.message_log.start()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app),
+                                   base_url="http://test", timeout=None)
+
+    async with client:
+        start = time.perf_counter()
+        latencies = await asyncio.gather(
+            *(one_request(client, "/chat", i) for i in range(args.concurrency))
+        )
+        wall = time.perf_counter() - start
+    if fake:
+        await api.message_log.stop()
+
+    latencies.sort()
+    threads = anyio.to_thread.current_default_thread_limiter().total_tokens
+    print(f"requests:            {args.concurrency}")
+    print(f"threadpool size:     {threads}")
+    print(f"wall time:           {wall:.2f}s")
+    print(f"latency p50 / p95:   {statistics.median(latencies):.2f}s / "
+          f"{latencies[int(len(latencies) * 0.95) - 1]:.2f}s")
+    if fake:
+        single = args.tokens * args.token_delay
+        print(f"single stream time:  {single:.2f}s")
+        print(f"peak open streams:   {fake.stats['peak']}")
+        log_stats = api.message_log.stats()
+        print(f"rows written:        {log_stats['rows_written']} "
+              f"in {api.supabase.calls['insert']} bulk inserts")
+        if fake.stats["peak"] > threads:
+            print("OK: concurrency is not capped by the threadpool")
+        else:
+            print("WARNING: concurrency capped at the threadpool size")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=50, help="tokens per fake answer")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between fake tokens")
+    parser.add_argument("--url", help="hit a running server instead of the in-process app")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
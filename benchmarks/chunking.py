@@ -0,0 +1,96 @@
+"""
+Chunker throughput and boundary quality: fixed 1000-char slices vs TokenChunker.
+
+Synthetic pages of paragraphs/sentences are streamed through each chunker
+at a few document sizes (time per page should stay flat: the pass is
+linear). Also reports how many chunks end mid-word / mid-sentence and the
+chunk size in tokens. Token counts use tiktoken when installed, else the
+character estimate from tokens.py.
+
+Usage (from the project root):
+    python -m benchmarks.chunking --pages 200 800 3200
+"""
+import time
+import random
+import argparse
+
+from tokens import count_tokens, clear_count_cache
+from chunking import FixedSizeChunker, TokenChunker
+
+WORDS = ("invoice total shipping refund contract clause payment delivery rabat casablanca "
+         "supplier customer warranty annex article signature amount period notice").split()
+
+
+def synthetic_pages(n, seed=0):
+    """Pages of 3-5 paragraphs; line-wrapped like pypdf output; some sentences cross pages"""
+    rng = random.Random(seed)
+    pages = []
+    for p in range(n):
+        paragraphs = []
+        for _ in range(rng.randint(3, 5)):
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 25))).capitalize() + rng.choice(".!?")
+                for _ in range(rng.randint(2, 6))
+            ]
+            text = " ".join(sentences)
+            # Wrap at ~80 chars like extracted PDF lines
+            lines, line = [], ""
+            for word in text.split():
+                if len(line) + len(word) > 80:
+                    lines.append(line)
+                    line = ""
+                line = f"{line} {word}".strip()
+            lines.append(line)
+            paragraphs.append("\n".join(lines))
+        text = "\n\n".join(paragraphs)
+        if p % 3 == 0:
+            text += "\n\nThis sentence is cut by the page"  # continues on the next page
+        pages.append((p + 1, text))
+    return pages
+
+
+def measure(chunker, pages):
+    clear_count_cache()
+    chars = sum(len(t) for _, t in pages)
+    start = time.perf_counter()
+    chunks = list(chunker.chunk(iter(pages)))
+    elapsed = time.perf_counter() - start
+    mid_word = sum(1 for c, _, _ in chunks[:-1] if c[-1:].isalnum())
+    mid_sentence = sum(1 for c, _, _ in chunks[:-1] if c.rstrip()[-1:] not in ".!?")
+    tokens = [count_tokens(c) for c, _, _ in chunks]
+    return {
+        "seconds": elapsed,
+        "us_per_page": elapsed / len(pages) * 1e6,
+        "mb_per_s": chars / elapsed / 1e6,
+        "chunks": len(chunks),
+        "avg_tokens": sum(tokens) / len(tokens),
+        "max_tokens": max(tokens),
+        "mid_word_pct": 100 * mid_word / max(len(chunks) - 1, 1),
+        "mid_sentence_pct": 100 * mid_sentence / max(len(chunks) - 1, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 800, 3200])
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=32)
+    args = parser.parse_args()
+
+    chunkers = {
+        "fixed-1000": FixedSizeChunker(1000),
+        "token": TokenChunker(max_tokens=args.max_tokens, overlap_tokens=args.overlap,
+                              min_tokens=args.max_tokens // 2),
+    }
+    print(f"{'chunker':<12}{'pages':>7}{'us/page':>9}{'MB/s':>7}{'chunks':>8}{'avg tok':>9}"
+          f"{'max tok':>9}{'mid-word':>10}{'mid-sent':>10}")
+    for n in args.pages:
+        pages = synthetic_pages(n)
+        for name, chunker in chunkers.items():
+            r = measure(chunker, pages)
+            print(f"{name:<12}{n:>7}{r['us_per_page']:>9.0f}{r['mb_per_s']:>7.1f}{r['chunks']:>8}"
+                  f"{r['avg_tokens']:>9.0f}{r['max_tokens']:>9}{r['mid_word_pct']:>9.0f}%{r['mid_sentence_pct']:>9.0f}%")
+
+
+if __name__ == "__main__":
+    main()
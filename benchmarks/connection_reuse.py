@@ -0,0 +1,72 @@
+"""
+Per-call latency with a new OpenAI client per call vs the shared pooled client.
+
+Runs offline against benchmarks/stub_embedding_server.py (real HTTP,
+simulated upstream latency): the OpenAI SDK picks up OPENAI_BASE_URL, so
+clients.get_openai_client() talks to the stub. "new client" builds and
+closes an OpenAI client for every call, the way the code did before the
+clients were shared, so every call pays a TCP connect. "shared pool" reuses
+the process-wide client and reports its connection-reuse stats. The stub is
+plain HTTP/1.1: against the real API each new connection also pays a TLS
+handshake, so the gap is wider there.
+
+Usage (from the project root):
+    python -m benchmarks.connection_reuse --calls 300 --concurrency 8
+"""
+import os
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from benchmarks.stub_embedding_server import start_stub_server
+
+
+def run(embed, calls, concurrency):
+    def timed(i):
+        t = time.perf_counter()
+        embed(f"question {i}")
+        return time.perf_counter() - t
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(timed, range(calls)))
+    return calls / (time.perf_counter() - start), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="stub per-request latency")
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    url, server = start_stub_server(args.latency_ms, dim=args.dim)
+    os.environ["OPENAI_API_KEY"] = "sk-offline"
+    os.environ["OPENAI_BASE_URL"] = url
+    import clients
+
+    def new_client(text):
+        with OpenAI(max_retries=0) as client:
+            client.embeddings.create(input=[text], model="text-embedding-3-small")
+
+    def shared(text):
+        clients.get_openai_client().embeddings.create(input=[text], model="text-embedding-3-small")
+
+    print(f"{args.calls} calls, {args.concurrency} threads, upstream latency {args.latency_ms:.0f} ms\n")
+    print(f"{'mode':<14}{'calls/s':>9}{'p50':>10}{'p95':>10}")
+    for name, embed in (("new client", new_client), ("shared pool", shared)):
+        rate, latencies = run(embed, args.calls, args.concurrency)
+        print(f"{name:<14}{rate:>9.0f}{np.percentile(latencies, 50) * 1e3:>7.1f} ms"
+              f"{np.percentile(latencies, 95) * 1e3:>7.1f} ms")
+    pool = clients.stats()["openai"]
+    print(f"\nshared pool: {pool['requests']} requests over {pool['connections']} connections "
+          f"(reuse rate {pool['reuse_rate']:.1%})")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Concurrent single-text embedding requests, with and without micro-batching.
+
+Runs offline against benchmarks/stub_embedding_server.py (real HTTP,
+simulated upstream latency). --concurrency async callers each embed
+--requests distinct texts one at a time, the way /rag embeds questions:
+first straight through EmbeddingService.aembed (one upstream call each),
+then through the EmbeddingBatcher for each window size. Reports throughput,
+caller latency, upstream calls and the batcher's batch-size / queue-wait
+histograms. Caches are off, so every text goes upstream. Vectors are small
+by default (--dim 256) so JSON encoding in the stub doesn't dominate on a
+small machine.
+
+Usage (from the project root):
+    python -m benchmarks.embedding_batching --concurrency 200 --windows 1 2 5
+"""
+import os
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from openai import OpenAI, AsyncOpenAI
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+from embeddings import EmbeddingService, EmbeddingBatcher, OpenAIEmbeddings
+from benchmarks.stub_embedding_server import start_stub_server
+
+
+def run(embed, concurrency, requests, prefix):
+    async def main():
+        latencies = []
+
+        async def caller(c):
+            for i in range(requests):
+                t = time.perf_counter()
+                await embed(f"{prefix} question {c}-{i}")
+                latencies.append(time.perf_counter() - t)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[caller(c) for c in range(concurrency)])
+        return time.perf_counter() - start, latencies
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5, help="texts per caller")
+    parser.add_argument("--windows", type=float, nargs="+", default=[1, 2, 5], help="batch windows (ms)")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub per-request latency")
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    url, server = start_stub_server(args.latency_ms, dim=args.dim)
+    provider = OpenAIEmbeddings(
+        client=OpenAI(api_key="sk-offline", base_url=url, max_retries=0),
+        async_client=AsyncOpenAI(api_key="sk-offline", base_url=url, max_retries=0),
+    )
+    total = args.concurrency * args.requests
+    print(f"{args.concurrency} callers x {args.requests} texts, upstream latency {args.latency_ms:.0f} ms\n")
+    print(f"{'mode':<18}{'texts/s':>9}{'p50':>10}{'p95':>10}{'calls':>7}{'batch p50':>11}{'max':>5}"
+          f"{'wait p95':>11}")
+
+    service = EmbeddingService(provider=provider, db_path=None, memory_items=0)
+    seconds, latencies = run(service.aembed, args.concurrency, args.requests, "direct")
+    print(f"{'direct':<18}{total / seconds:>9.0f}{np.percentile(latencies, 50) * 1e3:>7.1f} ms"
+          f"{np.percentile(latencies, 95) * 1e3:>7.1f} ms{service.api_calls:>7}")
+
+    for window in args.windows:
+        service = EmbeddingService(provider=provider, db_path=None, memory_items=0)
+        batcher = EmbeddingBatcher(service, window=window / 1000, max_batch=args.max_batch)
+        seconds, latencies = run(batcher.aembed, args.concurrency, args.requests, f"w{window}")
+        sizes, waits = batcher.batch_sizes.snapshot(), batcher.queue_wait.snapshot()
+        print(f"{f'batched {window:g} ms':<18}{total / seconds:>9.0f}{np.percentile(latencies, 50) * 1e3:>7.1f} ms"
+              f"{np.percentile(latencies, 95) * 1e3:>7.1f} ms{service.api_calls:>7}{sizes['p50']:>11.0f}"
+              f"{sizes['max']:>5.0f}{waits['p95'] * 1e3:>8.1f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Query-embedding latency: OpenAI over HTTP vs the local ONNX provider.
+
+The OpenAI row runs against benchmarks/stub_embedding_server.py, so it only
+shows the cost of the round trip (simulated upstream latency + HTTP); the
+real API adds its own queueing on top. The ONNX row runs the model in
+--model-dir (model.onnx + tokenizer.json, e.g. all-MiniLM-L6-v2 exported
+to ONNX) on this CPU. Caches are off: every query is embedded.
+
+Usage (from the project root):
+    python -m benchmarks.embedding_providers --model-dir models/all-MiniLM-L6-v2
+"""
+import os
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from openai import OpenAI, AsyncOpenAI
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+from embeddings import EmbeddingService, OpenAIEmbeddings, OnnxEmbeddings
+from benchmarks.stub_embedding_server import start_stub_server
+
+QUESTIONS = [
+    "What is the total amount of invoice {i}?",
+    "When is the delivery for order {i} due?",
+    "Which clause of contract {i} covers refunds?",
+    "ما هو مبلغ الفاتورة رقم {i}؟",
+]
+
+
+def questions(n):
+    return [QUESTIONS[i % len(QUESTIONS)].format(i=i) for i in range(n)]
+
+
+def single(service, texts):
+    latencies = []
+    for text in texts:
+        t = time.perf_counter()
+        service.embed(text)
+        latencies.append(time.perf_counter() - t)
+    return [float(np.percentile(latencies, p) * 1e3) for p in (50, 95)]
+
+
+def concurrent(service, texts, concurrency):
+    """Texts per second with `concurrency` async callers"""
+    async def run():
+        queue = list(texts)
+
+        async def worker():
+            while queue:
+                await service.aembed(queue.pop())
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return len(texts) / (time.perf_counter() - start)
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", help="ONNX sentence-embedding model (skipped when omitted)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub per-request latency")
+    args = parser.parse_args()
+
+    url, server = start_stub_server(args.latency_ms)
+    providers = {"openai (stub)": OpenAIEmbeddings(
+        client=OpenAI(api_key="sk-offline", base_url=url, max_retries=0),
+        async_client=AsyncOpenAI(api_key="sk-offline", base_url=url, max_retries=0),
+    )}
+    if args.model_dir:
+        providers["onnx (local)"] = OnnxEmbeddings(args.model_dir)
+
+    print(f"{'provider':<16}{'dim':>6}{'p50':>10}{'p95':>10}{f'texts/s @{args.concurrency}':>16}")
+    for offset, (name, provider) in enumerate(providers.items()):
+        # No cache tiers and fresh texts per run: every call reaches the provider
+        service = EmbeddingService(provider=provider, db_path=None, memory_items=0)
+        texts = questions(args.queries * 3)[offset::len(providers)]
+        p50, p95 = single(service, texts[:args.queries])
+        rate = concurrent(service, texts[args.queries:], args.concurrency)
+        print(f"{name:<16}{provider.dim or 0:>6}{p50:>7.2f} ms{p95:>7.2f} ms{rate:>16.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Embedding ingestion throughput: one call per chunk vs the batched pipeline.
+
+Runs offline against benchmarks/stub_embedding_server.py (real HTTP, simulated
+upstream latency) and an in-memory sink instead of Chroma, so only the
+embedding/upsert pipeline is measured. The last row re-ingests the same
+chunks through a warm embedding cache (nothing goes upstream).
+
+Usage (from the project root):
+    python -m benchmarks.ingest_embeddings --chunks 2000
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from openai import OpenAI
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+from embeddings import EmbeddingService
+from tuto.ingest_pdf import embed_and_store, EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+from benchmarks.stub_embedding_server import start_stub_server
+
+
+class SinkCollection:
+    """Counts upserts instead of writing them anywhere"""
+    def __init__(self):
+        self.rows = 0
+        self.calls = 0
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        self.rows += len(ids)
+        self.calls += 1
+
+
+def synthetic_records(n):
+    words = "the invoice total shipping refund contract clause payment delivery rabat".split()
+    for i in range(n):
+        text = " ".join(words[(i + j) % len(words)] for j in range(180))
+        yield f"doc_chunk_{i}", f"{i} {text}", {"source": "synthetic", "chunk_index": i}
+
+
+def run_serial(service, n):
+    """The original loop: one embeddings.create per chunk, one upsert at the end"""
+    sink = SinkCollection()
+    start = time.perf_counter()
+    ids, docs, embs, metas, tokens = [], [], [], [], 0
+    for chunk_id, text, meta in synthetic_records(n):
+        vectors, used = service.embed_batch([text])
+        ids.append(chunk_id); docs.append(text); embs.append(vectors[0]); metas.append(meta)
+        tokens += used
+    sink.upsert(ids, docs, embs, metas)
+    elapsed = time.perf_counter() - start
+    return {"chunks": n, "tokens": tokens, "seconds": elapsed, "batches": n, "upserts": sink.calls,
+            "chunks_per_s": n / elapsed, "tokens_per_s": tokens / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--serial-chunks", type=int, default=200, help="the serial baseline is slow; run fewer")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub per-request latency")
+    parser.add_argument("--per-item-ms", type=float, default=0.5, help="stub latency per input text")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY)
+    args = parser.parse_args()
+
+    url, server = start_stub_server(args.latency_ms, args.per_item_ms)
+    client = OpenAI(api_key="sk-offline", base_url=url, max_retries=0)
+
+    # No disk cache for the first two rows: every chunk goes upstream
+    rows = [("serial (1 call/chunk)", run_serial(EmbeddingService(client=client, db_path=None), args.serial_chunks))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = EmbeddingService(client=client, db_path=os.path.join(tmp, "cache.sqlite3"))
+        for name in (f"pipeline (batch {args.batch_size} x {args.concurrency})", "re-ingest (cached)"):
+            if name.startswith("re-ingest"):
+                # Fresh process memory: vectors must come back from the SQLite tier
+                service = EmbeddingService(client=client, db_path=os.path.join(tmp, "cache.sqlite3"))
+            stats = embed_and_store(
+                synthetic_records(args.chunks), SinkCollection(), embed=service.embed_batch,
+                batch_size=args.batch_size, concurrency=args.concurrency,
+            )
+            rows.append((name, stats))
+    server.shutdown()
+
+    print(f"{'mode':<28} {'chunks':>7} {'seconds':>8} {'chunks/s':>9} {'tokens/s':>10} {'batches':>8} {'upserts':>8}")
+    for name, s in rows:
+        print(f"{name:<28} {s['chunks']:>7} {s['seconds']:>8.2f} {s['chunks_per_s']:>9.1f} "
+              f"{s['tokens_per_s']:>10.0f} {s['batches']:>8} {s['upserts']:>8}")
+
+
+if __name__ == "__main__":
+    main()
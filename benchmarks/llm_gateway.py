@@ -0,0 +1,126 @@
+"""
+What the LLM gateway saves: single flight, retries and hedging.
+
+Runs offline against a fake AsyncOpenAI whose streams have a long-tailed
+time to first chunk (--slow-rate of them take --slow-ms instead of
+--latency-ms) and fail with a 429 at --error-rate. Each scenario runs
+straight against the client, then through an LLMGateway:
+
+- single flight: --concurrency identical non-streaming requests at once
+  (upstream calls);
+- retries: --requests streams (errors the caller sees);
+- hedging: the same streams with hedging on (time to first chunk).
+
+Usage (from the project root):
+    python -m benchmarks.llm_gateway --requests 400 --error-rate 0.05 --slow-rate 0.05
+"""
+import time
+import random
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+import openai
+
+from llm_gateway import LLMGateway
+
+
+class FakeAsyncOpenAI:
+    """Streams of `tokens` chunks; the first one arrives after a long-tailed delay"""
+    def __init__(self, args):
+        self.args = args
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, stream=False, **kwargs):
+        self.calls += 1
+        if random.random() < self.args.error_rate:
+            response = httpx.Response(429, request=httpx.Request("POST", "http://fake/chat/completions"))
+            raise openai.RateLimitError("rate limited", response=response, body=None)
+        slow = random.random() < self.args.slow_rate
+        delay = (self.args.slow_ms if slow else self.args.latency_ms) / 1000
+        if not stream:
+            await asyncio.sleep(delay)
+            message = SimpleNamespace(content="summary")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return self._stream(delay)
+
+    async def _stream(self, delay):
+        await asyncio.sleep(delay)
+        for i in range(self.args.tokens):
+            delta = SimpleNamespace(content=f"tok{i} ", tool_calls=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+            await asyncio.sleep(0.001)
+
+
+def streams(create, requests, concurrency):
+    """(errors, time-to-first-chunk list) for `requests` streams, `concurrency` at a time"""
+    async def run():
+        limit, errors, ttft = asyncio.Semaphore(concurrency), [0], []
+
+        async def one(i):
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    stream = await create(model="m", messages=[{"role": "user", "content": f"q{i}"}], stream=True)
+                    first = True
+                    async for _ in stream:
+                        if first:
+                            ttft.append(time.perf_counter() - start)
+                            first = False
+                except openai.APIError:
+                    errors[0] += 1
+
+        await asyncio.gather(*[one(i) for i in range(requests)])
+        return errors[0], ttft
+    return asyncio.run(run())
+
+
+def identical(create, concurrency):
+    async def run():
+        request = {"model": "m", "messages": [{"role": "user", "content": "summarize this"}]}
+        return await asyncio.gather(*[create(**request) for _ in range(concurrency)], return_exceptions=True)
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="usual time to first chunk")
+    parser.add_argument("--slow-ms", type=float, default=600.0, help="time to first chunk of a slow call")
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    args = parser.parse_args()
+    random.seed(0)
+
+    client = FakeAsyncOpenAI(args)
+    results = identical(client.chat.completions.create, args.concurrency)
+    direct = client.calls
+    client.calls, gateway = 0, LLMGateway(budget=5)
+    identical(lambda **kw: gateway.acreate(client, **kw), args.concurrency)
+    print(f"single flight: {args.concurrency} identical requests -> {direct} upstream calls direct, "
+          f"{client.calls} through the gateway (coalesced {gateway.coalesced}); "
+          f"{sum(isinstance(r, Exception) for r in results)} failed direct\n")
+
+    print(f"{args.requests} streams, {args.error_rate:.0%} 429s, {args.slow_rate:.0%} slow "
+          f"({args.slow_ms:.0f} ms vs {args.latency_ms:.0f} ms)")
+    print(f"{'mode':<18}{'errors':>7}{'calls':>7}{'ttft p50':>11}{'p95':>10}{'p99':>10}{'hedges':>8}{'wins':>6}")
+    modes = [("direct", None), ("retries", LLMGateway(budget=5)),
+             ("retries + hedge", LLMGateway(budget=5, hedge=True, hedge_after=0.1))]
+    for name, gateway in modes:
+        client.calls = 0
+        create = client.chat.completions.create
+        if gateway:
+            create = lambda gateway=gateway, **kw: gateway.acreate(client, **kw)
+        errors, ttft = streams(create, args.requests, args.concurrency)
+        p50, p95, p99 = (np.percentile(ttft, p) * 1e3 for p in (50, 95, 99))
+        hedges = f"{gateway.hedges:>8}{gateway.hedge_wins:>6}" if gateway else ""
+        print(f"{name:<18}{errors:>7}{client.calls:>7}{p50:>8.0f} ms{p95:>7.0f} ms{p99:>7.0f} ms{hedges}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+PDF text extraction: whole-document string vs streaming vs parallel streaming.
+
+Writes a synthetic multi-hundred-page PDF, then runs each mode in a fresh
+subprocess so peak RSS (ru_maxrss) is measured per mode:
+  - concat:   the original loop (full_text += page text, then slice)
+  - stream:   iter_pages(workers=1) -> FixedSizeChunker, one page in memory at a time
+  - parallel: iter_pages(workers=N), page ranges extracted by a process pool
+For parallel, the largest worker's peak RSS is reported separately.
+
+Usage (from the project root):
+    python -m benchmarks.pdf_extraction --pages 500 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+
+WORDS = ("invoice total shipping refund contract clause payment delivery rabat casablanca "
+         "supplier customer warranty annex article signature amount period notice").split()
+
+
+def write_pdf(path, pages, lines_per_page=50, seed=0):
+    """Minimal valid PDF (Helvetica text, one content stream per page)"""
+    rng = random.Random(seed)
+    objects = []  # bodies of objects 1..n, in order
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    page_tree = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for p in range(pages):
+        lines = [f"Page {p + 1}."] + [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        text = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {text} ET".encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (page_tree, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1, catalog, xref))
+
+
+def run_mode(mode, pdf, workers):
+    """Runs in the child process: extract + chunk, report throughput and peak RSS"""
+    from pypdf import PdfReader
+    from tuto.ingest_pdf import iter_pages
+    from chunking import FixedSizeChunker
+
+    start = time.perf_counter()
+    if mode == "concat":
+        reader = PdfReader(pdf)
+        full_text = ""
+        for page in reader.pages:
+            full_text += page.extract_text() + "\n"
+        chunks = [full_text[i:i + 1000] for i in range(0, len(full_text), 1000)]
+        pages, n_chunks = len(reader.pages), len(chunks)
+    else:
+        pages = n_chunks = 0
+        pages_iter = iter_pages(pdf, workers=1 if mode == "stream" else workers)
+        for _, first_page, last_page in FixedSizeChunker().chunk(pages_iter):
+            n_chunks += 1
+            pages = last_page
+    elapsed = time.perf_counter() - start
+
+    kb = 1 if sys.platform != "darwin" else 1024  # ru_maxrss is KB on Linux, bytes on macOS
+    return {
+        "mode": mode,
+        "pages": pages,
+        "chunks": n_chunks,
+        "seconds": elapsed,
+        "pages_per_s": pages / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / kb / 1024,
+        "worker_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / kb / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=50, help="text lines per page")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.pdf, args.workers)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "synthetic.pdf")
+        write_pdf(pdf, args.pages, args.lines)
+        print(f"{args.pages} pages, {os.path.getsize(pdf) / 1e6:.1f} MB, {args.workers} workers\n")
+        print(f"{'mode':<10}{'pages/s':>10}{'seconds':>10}{'chunks':>8}{'peak RSS':>11}{'worker RSS':>12}")
+        for mode in ("concat", "stream", "parallel"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.pdf_extraction", "--child", mode,
+                 "--pdf", pdf, "--workers", str(args.workers)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            worker = f"{r['worker_peak_rss_mb']:.0f} MB" if mode == "parallel" else "-"
+            print(f"{mode:<10}{r['pages_per_s']:>10.0f}{r['seconds']:>10.2f}{r['chunks']:>8}"
+                  f"{r['peak_rss_mb']:>8.0f} MB{worker:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cost of the query-time stages after retrieval: rerank, dedupe and pack.
+
+Fills a LocalVectorStore with synthetic chunks of a few documents (real
+TokenChunker output, so neighbouring chunks share their overlap), adds
+near-duplicate copies to some of them, then times MMR reranking, de-duplication
+and token-budget packing for growing candidate counts. Also reports the
+context tokens packed for the top k with and without rerank + dedupe (the
+difference is repeated overlap and duplicated text).
+
+Usage (from the project root):
+    python -m benchmarks.rerank --candidates 20 50 100 --dim 1536
+"""
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+from tokens import count_tokens
+from chunking import TokenChunker
+from vector_store import LocalVectorStore
+from rerank import MMRReranker, dedupe
+from rag import pack_context
+from benchmarks.chunking import synthetic_pages
+
+
+def build(path, dim, documents, pages, seed=0):
+    """Chunks synthetic documents; every 5th chunk gets a near-identical copy"""
+    rng = np.random.default_rng(seed)
+    store = LocalVectorStore(path)
+    results = []
+    for d in range(documents):
+        chunks = list(TokenChunker().chunk(synthetic_pages(pages, seed=d)))
+        base = rng.standard_normal((len(chunks), dim), dtype=np.float32)
+        for i, (text, first, last) in enumerate(chunks):
+            meta = {"source": f"doc{d}.pdf", "chunk_index": i, "page": first, "page_end": last}
+            results.append({"id": f"doc{d}#{i}", "document": text, "metadata": meta, "vector": base[i]})
+            if i % 5 == 0:
+                copy = {"source": f"copy-of-doc{d}.pdf", "chunk_index": i, "page": first, "page_end": last}
+                results.append({"id": f"copy{d}#{i}", "document": text, "metadata": copy,
+                                "vector": base[i] + 0.01 * rng.standard_normal(dim, dtype=np.float32)})
+    store.upsert(ids=[r["id"] for r in results], embeddings=[r.pop("vector").tolist() for r in results],
+                 documents=[r["document"] for r in results], metadatas=[r["metadata"] for r in results])
+    return store, results
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return out, (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        store, chunks = build(tmp, args.dim, documents=4, pages=30)
+        reranker = MMRReranker(store)
+        rng = np.random.default_rng(1)
+        print(f"{len(chunks)} chunks x {args.dim} dims, k={args.k}, budget={args.budget} tokens\n")
+        print(f"{'candidates':>10}{'rerank':>10}{'dedupe':>10}{'pack':>9}{'passages':>10}{'tokens':>8}"
+              f"{'tokens (top k as is)':>22}")
+        for n in args.candidates:
+            # Retrieval-like candidate list: a run of neighbouring chunks and their copies
+            start = int(rng.integers(0, len(chunks) - n))
+            candidates = [dict(c, score=1.0 / (60 + rank)) for rank, c in enumerate(chunks[start:start + n], 1)]
+            reranked, rerank_ms = timed(lambda: reranker.rerank("question", candidates, args.k), args.repeat)
+            merged, dedupe_ms = timed(lambda: dedupe(reranked), args.repeat)
+            (context, sources), pack_ms = timed(lambda: pack_context(merged, args.budget), args.repeat)
+            plain, _ = pack_context(candidates[:args.k], args.budget)
+            print(f"{n:>10}{rerank_ms:>7.2f} ms{dedupe_ms:>7.2f} ms{pack_ms:>6.2f} ms{len(sources):>10}"
+                  f"{count_tokens(context):>8}{count_tokens(plain):>22}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
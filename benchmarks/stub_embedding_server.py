@@ -0,0 +1,89 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint, for offline benchmarks.
+
+Answers POST .../embeddings with deterministic unit vectors (seeded from the
+text hash) after a simulated delay of  latency_ms + per_item_ms * len(input).
+Point an OpenAI client at it with base_url=<url>.
+
+Usage:
+    python -m benchmarks.stub_embedding_server --port 8765
+"""
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def fake_embedding(text, dim):
+    rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+    vector = rng.standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def make_handler(latency_ms, per_item_ms, dim):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        requests = 0
+        items = 0
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = body["input"]
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            time.sleep((latency_ms + per_item_ms * len(inputs)) / 1000)
+            Handler.requests += 1
+            Handler.items += len(inputs)
+
+            tokens = sum(len(t) // 4 + 1 for t in inputs)
+            payload = json.dumps({
+                "object": "list",
+                "model": body.get("model", "stub"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(t, dim).tolist()}
+                    for i, t in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    # Hundreds of clients connect at once in the concurrency benchmarks (default backlog: 5)
+    request_queue_size = 1024
+
+
+def start_stub_server(latency_ms=50.0, per_item_ms=0.5, dim=1536, port=0):
+    """Starts the server in a daemon thread. Returns (base_url, server)"""
+    server = StubServer(("127.0.0.1", port), make_handler(latency_ms, per_item_ms, dim))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1", server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--per-item-ms", type=float, default=0.5)
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+    url, server = start_stub_server(args.latency_ms, args.per_item_ms, args.dim, args.port)
+    print(f"Stub embedding server on {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
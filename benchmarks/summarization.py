@@ -0,0 +1,108 @@
+"""
+Prompt size and latency per turn, with and without rolling summarization.
+
+Runs a scripted 200-turn session through AIAgent against a stubbed LLM.
+The stub answers instantly; upstream latency is modelled as
+    base_ms + ms_per_token * prompt_tokens
+(prefill time grows with the prompt), so the numbers are reproducible offline.
+
+Modes:
+    full       - no trimming, no summary (the original behaviour)
+    trim       - history cut to max_context_tokens, older turns are lost
+    summarize  - older turns folded into a running summary (background thread)
+
+Usage (from the project root):
+    python -m benchmarks.summarization --turns 200
+"""
+import os
+import time
+import argparse
+import statistics
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+from agent_class import AIAgent
+from summarizer import SUMMARY_INSTRUCTIONS
+from tokens import message_tokens
+
+SUMMARY_MARKER = SUMMARY_INSTRUCTIONS.split(".")[0]
+
+
+class StubLLM:
+    """Fake OpenAI client: fixed-size answers, records prompt tokens per call"""
+    def __init__(self, answer_words=90, summary_words=200):
+        self.answer = " ".join(["answer"] * answer_words)
+        self.summary = " ".join(["summary"] * summary_words)
+        self.chat_prompts = []      # prompt tokens of the user-facing calls
+        self.summary_prompts = []   # prompt tokens of background summary calls
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        tokens = sum(message_tokens(m) for m in messages)
+        if messages[0]["content"].startswith(SUMMARY_MARKER):
+            self.summary_prompts.append(tokens)
+            content = self.summary
+        else:
+            self.chat_prompts.append(tokens)
+            content = self.answer
+        if kwargs.get("stream"):
+            delta = SimpleNamespace(content=content, tool_calls=None)
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=delta)])])
+        message = SimpleNamespace(role="assistant", content=content, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def user_turn(i):
+    topic = ["pricing", "the invoice", "shipping to Rabat", "the API keys", "refunds"][i % 5]
+    return f"Turn {i}: " + f"I have another question about {topic}, can you explain it in detail? " * (1 + i % 3)
+
+
+def run_session(mode, turns, max_context_tokens):
+    if mode == "full":
+        agent = AIAgent(max_context_tokens=10**9, summarize=False)
+    else:
+        agent = AIAgent(max_context_tokens=max_context_tokens, summarize=(mode == "summarize"))
+    stub = StubLLM()
+    agent.client = stub
+    if agent.summarizer:
+        agent.summarizer.client = stub
+
+    overhead = []
+    for i in range(turns):
+        start = time.perf_counter()
+        agent.chat(user_turn(i))
+        overhead.append(time.perf_counter() - start)
+        # The user "thinks" while the summary is written; let it finish before the next turn
+        if agent._summary_job is not None:
+            agent._summary_job[0].result()
+    return stub, overhead
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--max-context-tokens", type=int, default=4000)
+    parser.add_argument("--base-ms", type=float, default=300.0, help="modelled fixed latency per call")
+    parser.add_argument("--ms-per-token", type=float, default=0.1, help="modelled prefill cost per prompt token")
+    args = parser.parse_args()
+
+    def latency(tokens):
+        return args.base_ms + args.ms_per_token * tokens
+
+    print(f"{'mode':<10} {'turn 10':>8} {'turn 100':>9} {'last':>8} {'avg':>8} {'total':>10} "
+          f"{'avg ms':>8} {'last ms':>8} {'bg calls':>9} {'bg tokens':>10} {'local ms':>9}")
+    for mode in ("full", "trim", "summarize"):
+        stub, overhead = run_session(mode, args.turns, args.max_context_tokens)
+        prompts = stub.chat_prompts
+        at = lambda n: prompts[min(n, len(prompts)) - 1]
+        print(f"{mode:<10} {at(10):>8} {at(100):>9} {prompts[-1]:>8} {statistics.mean(prompts):>8.0f} "
+              f"{sum(prompts):>10} {statistics.mean(latency(t) for t in prompts):>8.0f} "
+              f"{latency(prompts[-1]):>8.0f} {len(stub.summary_prompts):>9} "
+              f"{sum(stub.summary_prompts):>10} {statistics.mean(overhead) * 1000:>9.2f}")
+    print("\nColumns turn N/last/avg/total are prompt tokens of the user-facing call; "
+          "'bg' columns are summary calls made off the request path.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Top-k similarity search: pure-Python cosine loop vs VectorIndex (NumPy).
+
+For each index size: the original loop (generator sums over Python lists,
+one vector at a time) - timed on a sample and extrapolated, since 1M
+vectors would take minutes per query - then VectorIndex single-query,
+batched multi-query (per-query cost) and the same index loaded back
+memory-mapped from .npy.
+
+1M x 1536 float32 is ~6 GB; use --dim 384 on smaller machines.
+
+Usage (from the project root):
+    python -m benchmarks.vector_search --sizes 10000 1000000 --dim 1536
+"""
+import math
+import time
+import argparse
+import tempfile
+import os
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def cosine_similarity(v1, v2):
+    """The original tuto/semantic_search.py implementation"""
+    dot_product = sum(a * b for a, b in zip(v1, v2))
+    magnitude_v1 = math.sqrt(sum(a * a for a in v1))
+    magnitude_v2 = math.sqrt(sum(b * b for b in v2))
+    return dot_product / (magnitude_v1 * magnitude_v2)
+
+
+def build_index(n, dim, rng, block=100_000):
+    index = VectorIndex(dim=dim, capacity=n)
+    for start in range(0, n, block):
+        m = min(block, n - start)
+        index.add(range(start, start + m), rng.standard_normal((m, dim), dtype=np.float32))
+    return index
+
+
+def timed(fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32, help="queries per batched search")
+    parser.add_argument("--loop-sample", type=int, default=2000, help="vectors timed for the Python loop")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.batch, args.dim), dtype=np.float32)
+    print(f"dim={args.dim} k={args.k} batch={args.batch}\n")
+    print(f"{'vectors':>9}{'python loop':>14}{'numpy':>11}{'batched/q':>11}{'mmap':>11}{'speedup':>9}")
+    for n in args.sizes:
+        index = build_index(n, args.dim, rng)
+
+        # Original loop on a sample, extrapolated to n vectors
+        sample = min(n, args.loop_sample)
+        docs = index.matrix[:sample].tolist()
+        q = queries[0].tolist()
+        start = time.perf_counter()
+        sorted(((cosine_similarity(q, d), i) for i, d in enumerate(docs)), reverse=True)[:args.k]
+        loop_s = (time.perf_counter() - start) * n / sample
+
+        repeat = 20 if n <= 100_000 else 3
+        single_s = timed(lambda: index.search(queries[0], args.k), repeat)
+        batch_s = timed(lambda: index.search_batch(queries, args.k), max(1, repeat // 4)) / args.batch
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index")
+            index.save(path)
+            del index
+            mapped = VectorIndex.load(path, mmap=True)
+            mmap_s = timed(lambda: mapped.search(queries[0], args.k), repeat)
+            del mapped
+
+        est = "~" if sample < n else ""
+        print(f"{n:>9}{est + f'{loop_s * 1e3:.0f} ms':>14}{single_s * 1e3:>8.2f} ms{batch_s * 1e3:>8.2f} ms"
+              f"{mmap_s * 1e3:>8.2f} ms{loop_s / single_s:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
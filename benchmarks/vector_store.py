@@ -0,0 +1,151 @@
+"""
+Local mmap vector store (float32 / int8) vs Chroma on the same data, offline.
+
+Builds each store from the same synthetic embeddings, then opens it in a
+fresh process to measure cold start (import + open + first query), warm
+query latency and peak RSS. Recall@k is measured against exact NumPy search
+(Chroma's HNSW and int8 quantization are both approximate).
+
+Usage (from the project root):
+    python -m benchmarks.vector_store --vectors 20000 --dim 1536
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+BACKENDS = ("chroma", "local-float32", "local-int8")
+
+
+def dataset(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def queries(vectors, count, seed=1):
+    """Noisy copies of stored vectors, so each query has a clear neighbourhood"""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    return picks + 0.05 * rng.standard_normal(picks.shape, dtype=np.float32)
+
+
+def open_store(backend, path):
+    if backend == "chroma":
+        import chromadb
+        client = chromadb.PersistentClient(path=path)
+        return client.get_or_create_collection(name="bench", metadata={"hnsw:space": "cosine"})
+    from vector_store import LocalVectorStore
+    return LocalVectorStore(path, dtype=backend.split("-")[1])
+
+
+def build(backend, path, vectors, batch=1000):
+    store = open_store(backend, path)
+    start = time.perf_counter()
+    for i in range(0, len(vectors), batch):
+        rows = range(i, min(i + batch, len(vectors)))
+        store.upsert(
+            ids=[f"doc_{j}" for j in rows],
+            embeddings=vectors[i:i + batch].tolist(),
+            documents=[f"chunk {j} of the synthetic corpus" for j in rows],
+            metadatas=[{"source": f"file_{j // 100}.pdf", "chunk_index": j % 100} for j in rows],
+        )
+    return time.perf_counter() - start
+
+
+def peak_rss_mb():
+    """Peak RSS of this process. VmHWM starts fresh at exec; ru_maxrss keeps the parent's peak on Linux"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    kb = 1 if sys.platform != "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / kb / 1024
+
+
+def run_child(backend, path, queries_file, k):
+    """Fresh process: cold start, warm latency, RSS, result ids for recall"""
+    qs = np.load(queries_file)
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    opened = time.perf_counter()
+    first = store.query(query_embeddings=[qs[0].tolist()], n_results=k)
+    cold = time.perf_counter()
+
+    latencies, ids = [], [first["ids"][0]]
+    for q in qs[1:]:
+        t = time.perf_counter()
+        ids.append(store.query(query_embeddings=[q.tolist()], n_results=k)["ids"][0])
+        latencies.append(time.perf_counter() - t)
+    return {
+        "open_s": opened - start,
+        "cold_query_s": cold - start,
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        "p95_ms": float(np.percentile(latencies, 95) * 1e3),
+        "rss_mb": peak_rss_mb(),
+        "ids": ids,
+    }
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--queries-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.path, args.queries_file, args.k)))
+        return
+
+    vectors = dataset(args.vectors, args.dim)
+    qs = queries(vectors, args.queries)
+    exact = np.argsort(-(qs @ vectors.T), axis=1)[:, :args.k]
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}\n")
+    print(f"{'backend':<15}{'build':>8}{'disk':>9}{'open':>9}{'cold query':>12}{'p50':>9}{'p95':>9}"
+          f"{'RSS':>9}{'recall':>8}")
+    tmp = tempfile.mkdtemp()
+    queries_file = os.path.join(tmp, "queries.npy")
+    np.save(queries_file, qs)
+    try:
+        for backend in args.backends:
+            path = os.path.join(tmp, backend)
+            build_s = build(backend, path, vectors)
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.vector_store", "--child", backend, "--path", path,
+                 "--queries-file", queries_file, "--k", str(args.k)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            recall = np.mean([
+                len({int(i.split("_")[1]) for i in got} & set(want.tolist())) / args.k
+                for got, want in zip(r["ids"], exact)
+            ])
+            print(f"{backend:<15}{build_s:>7.1f}s{dir_size(path) / 1e6:>6.0f} MB{r['open_s'] * 1e3:>6.0f} ms"
+                  f"{r['cold_query_s'] * 1e3:>9.0f} ms{r['p50_ms']:>6.1f} ms{r['p95_ms']:>6.1f} ms"
+                  f"{r['rss_mb']:>6.0f} MB{recall:>8.3f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
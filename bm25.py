@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+import numpy as np
+
+# Words in any script (Arabic included), plus compounds such as INV-2024-001 or 12/05
+_TOKENS = re.compile(r"\w+(?:[-/.]\w+)*")
+MERGE_AT = 500_000  # delta postings before they are merged into the main segment
+
+
+def tokenize(text):
+    """Lowercased words; compound tokens are kept whole *and* split into their parts"""
+    tokens = []
+    for match in _TOKENS.findall((text or "").lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(re.findall(r"\w+", match))
+    return tokens
+
+
+class BM25Index:
+    """
+    Incremental BM25 (Okapi) inverted index.
+
+    New chunks go to a small in-memory delta; merge() folds it into the main
+    segment, where each term's postings are numpy arrays sorted by impact
+    (the term's BM25 contribution). A query scores at most `max_postings`
+    best postings per term - exact for rare terms (ids, names, numbers),
+    a tight approximation for very common ones - so lookups stay fast at
+    millions of chunks. Deletes are tombstones, dropped at the next merge.
+    """
+    def __init__(self, path=None, k1=1.2, b=0.75, max_postings=1000):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings
+        self._lock = threading.Lock()
+
+        self.doc_ids = []                      # doc number -> chunk id
+        self._doc_of = {}                      # live chunk id -> doc number
+        self._lengths = np.zeros(1024, dtype=np.int32)
+        self._live = np.zeros(1024, dtype=bool)
+        self._total_len = 0
+
+        # Main segment (impact-ordered postings per term)
+        self._terms = {}                       # term -> index
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        # Delta: term -> [(doc, tf)]
+        self._delta = defaultdict(list)
+        self._delta_postings = 0
+
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    # --- Writes ---
+    def add(self, chunk_ids, texts):
+        with self._lock:
+            for chunk_id, text in zip(chunk_ids, texts):
+                self._delete(chunk_id)
+                counts = Counter(tokenize(text))
+                doc = len(self.doc_ids)
+                self.doc_ids.append(chunk_id)
+                self._doc_of[chunk_id] = doc
+                if doc >= len(self._lengths):
+                    self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+                    self._live = np.concatenate([self._live, np.zeros_like(self._live)])
+                length = sum(counts.values())
+                self._lengths[doc] = length
+                self._live[doc] = True
+                self._total_len += length
+                for term, tf in counts.items():
+                    self._delta[term].append((doc, min(tf, 65535)))
+                self._delta_postings += len(counts)
+            if self._delta_postings >= MERGE_AT:
+                self._merge()
+
+    def delete(self, chunk_ids):
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._delete(chunk_id)
+
+    def _delete(self, chunk_id):
+        doc = self._doc_of.pop(chunk_id, None)
+        if doc is not None:
+            self._live[doc] = False
+            self._total_len -= int(self._lengths[doc])
+
+    def merge(self):
+        with self._lock:
+            self._merge()
+
+    def _merge(self):
+        """Main + delta -> new main segment, without deleted docs, re-sorted by impact"""
+        n_terms = len(self._terms)
+        term_idx = [np.repeat(np.arange(n_terms), np.diff(self._offsets))]
+        docs, tfs = [self._docs], [self._tfs]
+        for term, postings in self._delta.items():
+            idx = self._terms.setdefault(term, len(self._terms))
+            arr = np.asarray(postings, dtype=np.int64)
+            term_idx.append(np.full(len(arr), idx))
+            docs.append(arr[:, 0].astype(np.int32))
+            tfs.append(arr[:, 1].astype(np.uint16))
+        term_idx, docs, tfs = np.concatenate(term_idx), np.concatenate(docs), np.concatenate(tfs)
+
+        keep = self._live[docs]
+        term_idx, docs, tfs = term_idx[keep], docs[keep], tfs[keep]
+        impact = self._term_weight(tfs.astype(np.float32), docs)
+        order = np.lexsort((-impact, term_idx))
+        self._docs, self._tfs = docs[order], tfs[order]
+        counts = np.bincount(term_idx, minlength=len(self._terms))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._delta = defaultdict(list)
+        self._delta_postings = 0
+
+    # --- Search ---
+    def _term_weight(self, tfs, docs):
+        """BM25 tf component: tf (k1 + 1) / (tf + k1 (1 - b + b dl / avgdl))"""
+        avgdl = self._total_len / max(len(self._doc_of), 1) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / avgdl)
+        return tfs * (self.k1 + 1) / (tfs + norm)
+
+    def search(self, query, k=10):
+        """[(chunk_id, score), ...] best first"""
+        with self._lock:
+            n = len(self._doc_of)
+            if not n:
+                return []
+            all_docs, all_scores = [], []
+            for term in set(tokenize(query)):
+                parts = []
+                idx = self._terms.get(term)
+                if idx is not None:
+                    start, stop = self._offsets[idx], self._offsets[idx + 1]
+                    parts.append((self._docs[start:min(stop, start + self.max_postings)],
+                                  self._tfs[start:min(stop, start + self.max_postings)], stop - start))
+                if term in self._delta:
+                    arr = np.asarray(self._delta[term], dtype=np.int64)
+                    parts.append((arr[:, 0], arr[:, 1], len(arr)))
+                df = sum(p[2] for p in parts)
+                if not df:
+                    continue
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for docs, tfs, _ in parts:
+                    alive = self._live[docs]
+                    docs, tfs = docs[alive], tfs[alive].astype(np.float32)
+                    all_docs.append(docs)
+                    all_scores.append(idf * self._term_weight(tfs, docs))
+            if not all_docs:
+                return []
+            docs = np.concatenate(all_docs)
+            if not len(docs):
+                return []
+            unique, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self.doc_ids[unique[i]], float(scores[i])) for i in top]
+
+    # --- Persistence: one .npz next to the vector store ---
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            if self._delta_postings:
+                self._merge()
+            n = len(self.doc_ids)
+            tmp = f"{path}.tmp.npz"
+            np.savez(
+                tmp,
+                terms=np.asarray(json.dumps(list(self._terms)), dtype=str),
+                doc_ids=np.asarray(json.dumps(self.doc_ids), dtype=str),
+                offsets=self._offsets, docs=self._docs, tfs=self._tfs,
+                lengths=self._lengths[:n], live=self._live[:n],
+            )
+            os.replace(tmp, path)
+
+    def _load(self, path):
+        with np.load(path) as f:
+            self._terms = {term: i for i, term in enumerate(json.loads(str(f["terms"])))}
+            self.doc_ids = json.loads(str(f["doc_ids"]))
+            self._offsets, self._docs, self._tfs = f["offsets"], f["docs"], f["tfs"]
+            n = len(self.doc_ids)
+            self._lengths = np.zeros(max(n, 1024), dtype=np.int32)
+            self._live = np.zeros(max(n, 1024), dtype=bool)
+            self._lengths[:n], self._live[:n] = f["lengths"], f["live"]
+        self._doc_of = {self.doc_ids[doc]: int(doc) for doc in np.flatnonzero(self._live[:n])}
+        self._total_len = int(self._lengths[:n][self._live[:n]].sum())
+
+
+def rebuild_from_collection(collection, index, page=5000):
+    """Indexes every document already stored in a Chroma/LocalVectorStore collection"""
+    offset = 0
+    while True:
+        batch = collection.get(limit=page, offset=offset, include=["documents"])
+        if not batch["ids"]:
+            break
+        index.add(batch["ids"], batch["documents"])
+        offset += len(batch["ids"])
+    return index
+
+
+if __name__ == "__main__":
+    # One-off: build the lexical index for a knowledge base ingested before it existed
+    from dotenv import load_dotenv
+    from vector_store import get_collection, get_lexical_index
+
+    load_dotenv()
+    collection = get_collection()
+    index = get_lexical_index()
+    rebuild_from_collection(collection, index)
+    index.save()
+    print(f"Indexed {len(index)} chunks into {index.path}")
@@ -0,0 +1,184 @@
+import re
+from pathlib import Path
+from collections import deque
+from tokens import count_tokens
+
+EMBEDDING_MODEL = "text-embedding-3-small"  # tokenizer used for chunk budgets
+
+# Blank line = paragraph break; sentence ends at . ! ? (and the Arabic question mark)
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+_SENTENCES = re.compile(r"(?<=[.!?؟])\s+")
+_SENTENCE_END = re.compile(r"[.!?؟:;][\"')\]]*\s*$")
+
+
+class _Unit:
+    """One sentence (or a piece of an over-long one) with its token count and pages"""
+    __slots__ = ("text", "tokens", "first_page", "last_page", "ends_paragraph")
+
+    def __init__(self, text, tokens, first_page, last_page, ends_paragraph):
+        self.text = text
+        self.tokens = tokens
+        self.first_page = first_page
+        self.last_page = last_page
+        self.ends_paragraph = ends_paragraph
+
+
+class FixedSizeChunker:
+    """
+    The original chunker: every `chunk_size` characters, across page breaks.
+    Kept for comparison (benchmarks) and for documents without structure.
+    """
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+
+    def chunk(self, pages):
+        """(page_number, text) pairs in, (chunk, first_page, last_page) out"""
+        buf = ""
+        spans = deque()  # [page_number, chars of that page still in buf]
+
+        def take(n):
+            nonlocal buf
+            chunk, buf = buf[:n], buf[n:]
+            first = last = spans[0][0]
+            left = n
+            while left:
+                span = spans[0]
+                used = min(left, span[1])
+                last = span[0]
+                span[1] -= used
+                left -= used
+                if span[1] == 0:
+                    spans.popleft()
+            return chunk, first, last
+
+        for page_number, text in pages:
+            text += "\n"
+            buf += text
+            spans.append([page_number, len(text)])
+            while len(buf) >= self.chunk_size:
+                yield take(self.chunk_size)
+        if buf:
+            yield take(len(buf))
+
+
+class TokenChunker:
+    """
+    Token-budgeted chunks that end on sentence (preferably paragraph) boundaries.
+
+    One streaming pass over the pages: text is split into paragraphs and
+    sentences, each sentence is counted once (count_tokens is cached), and
+    sentences are packed greedily up to `max_tokens`. A chunk that is at
+    least `min_tokens` long is closed early at a paragraph end. The last
+    sentences of a chunk (up to `overlap_tokens`) are repeated at the start
+    of the next one. A sentence cut by a page break is carried to the next
+    page; sentences longer than `max_tokens` are split between words.
+    """
+    def __init__(self, max_tokens=256, overlap_tokens=32, min_tokens=128, model=EMBEDDING_MODEL):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+        self.model = model
+
+    # --- Document structure (override in subclasses for other document types) ---
+    def paragraphs(self, text):
+        return _PARAGRAPHS.split(text)
+
+    def sentences(self, paragraph):
+        # Line wraps inside a paragraph are just spaces
+        return _SENTENCES.split(" ".join(paragraph.split()))
+
+    # --- Streaming pass ---
+    def units(self, pages):
+        """Yields _Unit per sentence, in order, keeping sentences whole across page breaks"""
+        carry, carry_page = "", None
+        for page_number, text in pages:
+            paragraphs = self.paragraphs(text)
+            for i, paragraph in enumerate(paragraphs):
+                sentences = [s for s in self.sentences(paragraph) if s]
+                if not sentences:
+                    continue
+                is_last = i == len(paragraphs) - 1
+                for j, sentence in enumerate(sentences):
+                    first_page = page_number
+                    if carry:
+                        sentence, first_page = f"{carry} {sentence}", carry_page
+                        carry = ""
+                    if is_last and j == len(sentences) - 1 and not _SENTENCE_END.search(sentence) \
+                            and len(sentence) < self.max_tokens * 8:
+                        # Probably continues on the next page
+                        carry, carry_page = sentence, first_page
+                        break
+                    # A page break after a complete sentence counts as a paragraph end
+                    yield from self._split(sentence, first_page, page_number, j == len(sentences) - 1)
+        if carry:
+            yield from self._split(carry, carry_page, carry_page, True)
+
+    def _split(self, sentence, first_page, last_page, ends_paragraph):
+        tokens = count_tokens(sentence, self.model)
+        if tokens <= self.max_tokens:
+            yield _Unit(sentence, tokens, first_page, last_page, ends_paragraph)
+            return
+        # Over-long "sentence" (tables, lists without punctuation): cut between words
+        words, used = [], 0
+        for word in sentence.split(" "):
+            cost = count_tokens(word, self.model)
+            if words and used + cost > self.max_tokens:
+                yield _Unit(" ".join(words), used, first_page, last_page, False)
+                words, used = [], 0
+            words.append(word)
+            used += cost
+        if words:
+            yield _Unit(" ".join(words), used, first_page, last_page, ends_paragraph)
+
+    def chunk(self, pages):
+        """(page_number, text) pairs in, (chunk, first_page, last_page) out"""
+        current = deque()  # units of the chunk being built
+        total = 0
+        fresh = 0          # units added since the last chunk (the rest is overlap)
+
+        def emit():
+            parts = []
+            for k, unit in enumerate(current):
+                if k:
+                    parts.append("\n\n" if current[k - 1].ends_paragraph else " ")
+                parts.append(unit.text)
+            return "".join(parts), current[0].first_page, current[-1].last_page
+
+        for unit in self.units(pages):
+            while current and total + unit.tokens > self.max_tokens:
+                if fresh:
+                    yield emit()
+                    total, fresh = self._keep_overlap(current, total)
+                else:
+                    # Overlap alone + this sentence do not fit: drop overlap first
+                    total -= current.popleft().tokens
+            current.append(unit)
+            total += unit.tokens
+            fresh += 1
+            if unit.ends_paragraph and total >= self.min_tokens:
+                yield emit()
+                total, fresh = self._keep_overlap(current, total)
+        if fresh:
+            yield emit()
+
+    def _keep_overlap(self, current, total):
+        """Drops all but the trailing units that fit in overlap_tokens. Returns (total, fresh=0)"""
+        kept = 0
+        for unit in reversed(current):
+            if kept + unit.tokens > self.overlap_tokens:
+                break
+            kept += unit.tokens
+        while total > kept:
+            total -= current.popleft().tokens
+        return total, 0
+
+
+# Chunker per document type (file extension); "default" for anything else
+CHUNKERS = {
+    "default": TokenChunker(),
+    ".pdf": TokenChunker(),
+}
+
+
+def chunker_for(path):
+    return CHUNKERS.get(Path(path).suffix.lower(), CHUNKERS["default"])
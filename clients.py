@@ -0,0 +1,126 @@
+import os
+import threading
+import importlib.util
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient, Timeout, DEFAULT_CONNECTION_LIMITS
+
+# h2 is only needed for HTTP/2; without it the pools speak HTTP/1.1 with keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def pool_settings(limits_type=httpx.Limits, timeout_type=httpx.Timeout):
+    """
+    Pool configuration shared by every client, from the environment (read at
+    call time, after load_dotenv()): HTTP2 (1/0), HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY (seconds an idle connection is
+    kept), HTTP_TIMEOUT and HTTP_CONNECT_TIMEOUT. The types are those of the
+    httpx the client is built on (newer openai SDKs ship their own).
+    """
+    return {
+        "http2": HTTP2_AVAILABLE and os.environ.get("HTTP2", "1") == "1",
+        "limits": limits_type(
+            max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "60")),
+        ),
+        "timeout": timeout_type(
+            float(os.environ.get("HTTP_TIMEOUT", "60")),
+            connect=float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5")),
+        ),
+    }
+
+
+class PoolStats:
+    """
+    Connection reuse of one pool, from httpcore trace events: requests sent,
+    new TCP connections and TLS handshakes. reuse_rate is the share of
+    requests that went out on an already open connection.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.http2_requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def _event(self, name, info):
+        with self._lock:
+            if name == "connection.connect_tcp.complete":
+                self.connections += 1
+            elif name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+            elif name.endswith(".send_request_headers.started"):
+                self.requests += 1
+                if name.startswith("http2."):
+                    self.http2_requests += 1
+
+    async def _aevent(self, name, info):
+        self._event(name, info)
+
+    # Request hooks: attach the trace callback to every request of the client
+    def hook(self, request):
+        request.extensions["trace"] = self._event
+
+    async def ahook(self, request):
+        request.extensions["trace"] = self._aevent
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.connections, 0)
+            return {
+                "requests": self.requests,
+                "http2_requests": self.http2_requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+# --- Process-wide clients: one pool each, shared by every caller ---
+# Limits/Timeout as the openai SDK's own httpx expects them
+OPENAI_POOL_TYPES = (type(DEFAULT_CONNECTION_LIMITS), Timeout)
+_clients = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def _shared(name, make):
+    with _lock:
+        if name not in _clients:
+            _stats[name] = PoolStats()
+            _clients[name] = make(_stats[name])
+        return _clients[name]
+
+
+def get_openai_client():
+    return _shared("openai", lambda stats: OpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        http_client=DefaultHttpxClient(**pool_settings(*OPENAI_POOL_TYPES), event_hooks={"request": [stats.hook]}),
+    ))
+
+
+def get_async_openai_client():
+    return _shared("openai_async", lambda stats: AsyncOpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        http_client=DefaultAsyncHttpxClient(**pool_settings(*OPENAI_POOL_TYPES), event_hooks={"request": [stats.ahook]}),
+    ))
+
+
+def get_supabase_client():
+    """Supabase over the shared pool, or the in-memory stand-in with SUPABASE_FAKE=1"""
+    def make(stats):
+        if os.environ.get("SUPABASE_FAKE") == "1":
+            from fake_supabase import FakeSupabaseClient
+            return FakeSupabaseClient()
+        from supabase import create_client, ClientOptions
+        http_client = httpx.Client(**pool_settings(), event_hooks={"request": [stats.hook]})
+        return create_client(
+            os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY"),
+            options=ClientOptions(httpx_client=http_client),
+        )
+    return _shared("supabase", make)
+
+
+def stats():
+    with _lock:
+        return {name: s.snapshot() for name, s in _stats.items()}
@@ -0,0 +1,493 @@
+import os
+import time
+import queue
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+import numpy as np
+from dotenv import load_dotenv
+from clients import get_openai_client, get_async_openai_client
+from llm_gateway import is_retryable
+from metrics import Histogram
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:  # optional: only the local ONNX provider needs them
+    onnxruntime = None
+
+load_dotenv()
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+MAX_BATCH = 256  # texts per embeddings.create call
+# Output size of the OpenAI embedding models
+OPENAI_DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+DEFAULT_DB = os.environ.get(
+    "EMBEDDING_CACHE_DB", str(Path(__file__).resolve().parent / "embedding_cache.sqlite3")
+)
+
+
+def content_key(model, text):
+    """Content address of an embedding: same model + same text = same vector"""
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """On-disk tier: float32 vectors as BLOBs in SQLite, keyed by content hash"""
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, dim INTEGER, vector BLOB)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            # SQLite caps bound parameters, so look up in slices
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)",
+                [(key, len(vec), np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items],
+            )
+            self._db.commit()
+
+
+# --- Providers: embed(texts) -> (vectors, tokens), aembed(texts), plus name / model / dim ---
+class OpenAIEmbeddings:
+    """text-embedding-3-* through the OpenAI API (one embeddings.create per call)"""
+    name = "openai"
+
+    def __init__(self, model=EMBEDDING_MODEL, client=None, async_client=None):
+        # The bare model name is the cache namespace, as before providers existed
+        self.model = model
+        self.dim = OPENAI_DIMS.get(model)
+        self.client = client
+        self.async_client = async_client
+
+    def embed(self, texts):
+        client = self.client or get_openai_client()
+        return self._parse(client.embeddings.create(input=texts, model=self.model))
+
+    async def aembed(self, texts):
+        client = self.async_client or get_async_openai_client()
+        return self._parse(await client.embeddings.create(input=texts, model=self.model))
+
+    @staticmethod
+    def _parse(response):
+        vectors = [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+        return vectors, response.usage.total_tokens if response.usage else 0
+
+
+def model_digest(model_dir, max_length):
+    """Short hash of model.onnx, tokenizer.json and the truncation length"""
+    digest = hashlib.sha256(str(max_length).encode())
+    for name in ("model.onnx", "tokenizer.json"):
+        with open(os.path.join(model_dir, name), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class OnnxEmbeddings:
+    """
+    Local sentence-embedding model (e.g. all-MiniLM-L6-v2 exported to ONNX)
+    run on CPU with onnxruntime, so embedding a query needs no network hop.
+    `model_dir` holds model.onnx and tokenizer.json. Texts are sorted by
+    length and run in batches of `batch_size` (less padding), mean-pooled
+    over the attention mask and L2-normalized. aembed() runs on a small
+    thread pool; onnxruntime releases the GIL while it computes.
+    """
+    name = "onnx"
+
+    def __init__(self, model_dir, batch_size=32, max_length=256, threads=None, workers=2):
+        if onnxruntime is None:
+            raise ImportError("The ONNX embedding provider needs onnxruntime and tokenizers")
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+        # The cache namespace and the identity collections are checked against: from the
+        # model's content, so two models exported to same-named directories never mix
+        self.model = f"onnx:{os.path.basename(os.path.normpath(model_dir))}:{model_digest(model_dir, max_length)}"
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onnx-embed")
+        dim = self.session.get_outputs()[0].shape[-1]
+        self.dim = dim if isinstance(dim, int) else len(self.embed(["dimension probe"])[0][0])
+
+    def _run(self, texts):
+        encoded = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feed = {
+            "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encoded], dtype=np.int64),
+        }
+        output = self.session.run(None, {name: v for name, v in feed.items() if name in self.inputs})[0]
+        if output.ndim == 3:
+            # Token embeddings -> mean over the real (unpadded) tokens
+            weights = mask[:, :, None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return output / np.maximum(np.linalg.norm(output, axis=1, keepdims=True), 1e-12)
+
+    def embed(self, texts):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            for i, vector in zip(rows, self._run([texts[i] for i in rows])):
+                vectors[i] = vector.tolist()
+        return vectors, 0  # no tokens billed
+
+    async def aembed(self, texts):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self.embed, texts)
+
+
+class EmbeddingService:
+    """
+    One place to get embeddings, with two cache tiers in front of the
+    provider (OpenAI by default, or a local ONNX model): an in-memory LRU and
+    an SQLite store that survives restarts. Only texts never seen before
+    (for this model) are sent to the provider, in batches of MAX_BATCH.
+    """
+    def __init__(self, client=None, async_client=None, model=EMBEDDING_MODEL,
+                 db_path=DEFAULT_DB, memory_items=20_000, provider=None):
+        self.provider = provider or OpenAIEmbeddings(model, client, async_client)
+        self.model = self.provider.model
+        self.memory_items = memory_items
+        self._memory = OrderedDict()  # key -> np.float32 vector
+        self._lock = threading.Lock()
+        self.store = EmbeddingStore(db_path) if db_path else None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self.tokens = 0
+
+    # --- Cache tiers ---
+    def _lookup(self, keys, disk=True):
+        """Returns {key: vector} for everything already cached (memory, then disk unless disk=False)"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+            self.memory_hits += len(found)
+        missing = [k for k in keys if k not in found]
+        if disk and missing and self.store is not None:
+            on_disk = self.store.get_many(missing)
+            with self._lock:
+                self.disk_hits += len(on_disk)
+            self._remember(on_disk.items())
+            found.update(on_disk)
+        return found
+
+    def _remember(self, items):
+        with self._lock:
+            for key, vec in items:
+                self._memory[key] = vec
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _save(self, keys, vectors):
+        items = [(k, np.asarray(v, dtype=np.float32)) for k, v in zip(keys, vectors)]
+        self._remember(items)
+        if self.store is not None:
+            self.store.put_many(items)
+
+    def _plan(self, texts):
+        """Content keys per text, the cached vectors, and the unique texts to embed"""
+        keys = [content_key(self.model, t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        with self._lock:
+            self.misses += len(todo)
+        return keys, found, todo
+
+    # --- Public API ---
+    def embed_batch(self, texts):
+        """Vectors (lists, input order) for many texts + tokens spent upstream"""
+        keys, found, todo = self._plan(texts)
+        tokens = 0
+        todo_keys, todo_texts = list(todo), list(todo.values())
+        for i in range(0, len(todo_texts), MAX_BATCH):
+            vectors, used = self.provider.embed(todo_texts[i:i + MAX_BATCH])
+            tokens += self._record(vectors, used, todo_keys[i:i + MAX_BATCH], found)
+        return [found[k].tolist() for k in keys], tokens
+
+    async def aembed_batch(self, texts):
+        """Async version of embed_batch() (cache lookups are local and fast)"""
+        keys, found, todo = self._plan(texts)
+        tokens = 0
+        todo_keys, todo_texts = list(todo), list(todo.values())
+        for i in range(0, len(todo_texts), MAX_BATCH):
+            vectors, used = await self.provider.aembed(todo_texts[i:i + MAX_BATCH])
+            tokens += self._record(vectors, used, todo_keys[i:i + MAX_BATCH], found)
+        return [found[k].tolist() for k in keys], tokens
+
+    def _record(self, vectors, used, keys, found):
+        self._save(keys, vectors)
+        for key, vec in zip(keys, vectors):
+            found[key] = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            self.api_calls += 1
+            self.tokens += used
+        return used
+
+    def cached(self, text, disk=True):
+        """The cached vector for `text` (memory, then disk unless disk=False), or None"""
+        key = content_key(self.model, text)
+        vec = self._lookup([key], disk).get(key)
+        return None if vec is None else vec.tolist()
+
+    def embed_many(self, texts):
+        return self.embed_batch(texts)[0]
+
+    def embed(self, text):
+        return self.embed_batch([text])[0][0]
+
+    async def aembed(self, text):
+        return (await self.aembed_batch([text]))[0][0]
+
+    def describe(self):
+        """What a collection built with this service records: provider, model and dimension"""
+        return {"embedding_provider": self.provider.name, "embedding_model": self.model,
+                "embedding_dim": self.provider.dim}
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "provider": self.model,
+            "memory_items": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "api_calls": self.api_calls,
+            "tokens": self.tokens,
+        }
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batching of single-text embedding requests.
+
+    Callers on any thread (or on the event loop, via aembed) queue one text
+    and wait for its vector. A dispatcher thread takes the first waiting
+    text, collects more for up to `window` seconds or `max_batch` texts,
+    and sends them as one embed_batch() call; the vectors are fanned back
+    out to the callers. Cache hits never wait in the queue. At most
+    `concurrency` batches are in flight; while they are, new texts pile up
+    and go out together in the next batch.
+    Only the in-memory cache is checked on the caller's side (it may be the
+    event loop); the SQLite tier is read by the batch worker, in embed_batch().
+    """
+    def __init__(self, service, window=0.002, max_batch=64, concurrency=4):
+        self.service = service
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed-batch")
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.batch_sizes = Histogram()
+        self.queue_wait = Histogram()   # seconds from submit to the upstream call
+        self.requests = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.splits = 0
+        self.failures = 0
+
+    # --- Producer side ---
+    def submit(self, text):
+        """Future resolving to the vector (a list) for `text`"""
+        future = Future()
+        vector = self.service.cached(text, disk=False)
+        with self._lock:
+            self.requests += 1
+            self.cache_hits += vector is not None
+        if vector is not None:
+            future.set_result(vector)
+            return future
+        self._start()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text):
+        return self.submit(text).result()
+
+    async def aembed(self, text):
+        return await asyncio.wrap_future(self.submit(text))
+
+    # --- Dispatcher ---
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """Waits for the first text, then collects more until size or time runs out"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._slots.acquire()  # wait for a free upstream slot first: the queue keeps filling meanwhile
+            self._pool.submit(self._embed, self._next_batch())
+
+    def _embed(self, batch):
+        try:
+            # Drop callers that gave up while queued (e.g. a cancelled request)
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                return
+            start = time.perf_counter()
+            for _, _, queued in batch:
+                self.queue_wait.observe(start - queued)
+            self.batch_sizes.observe(len(batch))
+            with self._lock:
+                self.batches += 1
+            self._embed_items(batch)
+        finally:
+            self._slots.release()
+
+    def _embed_items(self, batch):
+        """
+        One embed_batch() call for the batch, fanned back out. When it fails for
+        a reason other than a transient upstream error (e.g. a 400 on one
+        over-long text), each half is retried on its own, so a bad input only
+        fails its own caller. Halves already embedded are served from the cache.
+        """
+        try:
+            vectors, _ = self.service.embed_batch([text for text, _, _ in batch])
+        except Exception as e:
+            if len(batch) > 1 and not is_retryable(e):
+                with self._lock:
+                    self.splits += 1
+                middle = len(batch) // 2
+                self._embed_items(batch[:middle])
+                self._embed_items(batch[middle:])
+                return
+            with self._lock:
+                self.failures += 1
+            print(f"Error embedding a batch of {len(batch)}: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "batches": self.batches,
+            "splits": self.splits,
+            "failures": self.failures,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_s": self.queue_wait.snapshot(),
+        }
+
+
+# --- Process-wide default service (what get_embedding() uses) ---
+_service = None
+_batcher = None
+_service_lock = threading.Lock()
+
+
+def get_provider():
+    """EMBEDDING_PROVIDER=openai (default) or onnx (with EMBEDDING_MODEL_DIR); read at call time"""
+    if os.environ.get("EMBEDDING_PROVIDER", "openai") == "onnx":
+        model_dir = os.environ.get("EMBEDDING_MODEL_DIR")
+        if not model_dir:
+            raise ValueError("EMBEDDING_PROVIDER=onnx needs EMBEDDING_MODEL_DIR (model.onnx + tokenizer.json)")
+        return OnnxEmbeddings(model_dir)
+    return OpenAIEmbeddings()
+
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService(provider=get_provider())
+        return _service
+
+
+def get_batcher():
+    """
+    Process-wide EmbeddingBatcher over get_service(), configured by
+    EMBEDDING_BATCH_WINDOW_MS (default 2; 0 turns batching off) and
+    EMBEDDING_BATCH_SIZE (default 64). Returns None when batching is off.
+    """
+    global _batcher
+    window_ms = float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", "2"))
+    if window_ms <= 0:
+        return None
+    service = get_service()
+    with _service_lock:
+        if _batcher is None:
+            _batcher = EmbeddingBatcher(
+                service, window=window_ms / 1000, max_batch=int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+            )
+        return _batcher
+
+
+def get_embedding(text):
+    """Drop-in replacement for the per-script helpers: cached vector from the configured provider"""
+    batcher = get_batcher()
+    # Concurrent callers share upstream calls through the batcher
+    return batcher.embed(text) if batcher else get_service().embed(text)
+
+
+async def aget_embedding(text):
+    """Async get_embedding() for the server"""
+    batcher = get_batcher()
+    return await batcher.aembed(text) if batcher else await get_service().aembed(text)
+
+
+def get_embeddings(texts):
+    return get_service().embed_many(texts)
@@ -0,0 +1,112 @@
+import time
+import random
+import threading
+from types import SimpleNamespace
+from collections import defaultdict
+
+
+class FakeSupabaseClient:
+    """
+    In-memory stand-in for the Supabase client, so the server and benchmarks
+    can run offline. Only the query builder calls this project uses are
+    implemented: insert / upsert / select / eq / order / limit / delete / execute.
+    """
+    def __init__(self, latency=0.0, fail_rate=0.0):
+        self.latency = latency          # seconds added to every execute()
+        self.fail_rate = fail_rate      # probability that execute() raises
+        self.tables = defaultdict(list)
+        self.calls = defaultdict(int)   # e.g. {"insert": 3, "select": 10}
+        self._next_id = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+
+class _FakeQuery:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.op = "select"
+        self.rows = []
+        self.filters = []
+        self.order_by = None
+        self.max_rows = None
+        self.conflict_key = None
+        self.count_mode = None
+
+    def insert(self, rows):
+        self.op = "insert"
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict="id"):
+        self.insert(rows)
+        self.op = "upsert"
+        self.conflict_key = on_conflict
+        return self
+
+    def select(self, *columns, count=None):
+        self.op = "select"
+        self.count_mode = count
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.max_rows = n
+        return self
+
+    def _match(self, row):
+        return all(row.get(col) == val for col, val in self.filters)
+
+    def execute(self):
+        client = self.client
+        if client.latency:
+            time.sleep(client.latency)
+        if client.fail_rate and random.random() < client.fail_rate:
+            raise ConnectionError("fake supabase: simulated failure")
+
+        with client._lock:
+            client.calls[self.op] += 1
+            table = client.tables[self.name]
+
+            if self.op == "upsert":
+                # Replace rows that share the conflict key, insert the rest
+                keys = {row.get(self.conflict_key) for row in self.rows}
+                table[:] = [row for row in table if row.get(self.conflict_key) not in keys]
+
+            if self.op in ("insert", "upsert"):
+                inserted = []
+                for row in self.rows:
+                    client._next_id[self.name] += 1
+                    stored = {"id": client._next_id[self.name], **row}
+                    table.append(stored)
+                    inserted.append(dict(stored))
+                return SimpleNamespace(data=inserted, count=len(inserted))
+
+            if self.op == "delete":
+                kept = [row for row in table if not self._match(row)]
+                removed = len(table) - len(kept)
+                client.tables[self.name] = kept
+                return SimpleNamespace(data=[], count=removed)
+
+            data = [dict(row) for row in table if self._match(row)]
+            # count="exact": every matching row, before the limit (like PostgREST)
+            total = len(data) if self.count_mode else None
+            if self.order_by:
+                column, desc = self.order_by
+                data.sort(key=lambda row: row.get(column), reverse=desc)
+            if self.max_rows is not None:
+                data = data[:self.max_rows]
+            return SimpleNamespace(data=data, count=total)
@@ -0,0 +1,129 @@
+import sys
+import threading
+from collections import OrderedDict, deque
+
+
+def _message_size(message):
+    """Rough memory cost of one cached message, in bytes"""
+    return sys.getsizeof(message.get("content") or "") + 200
+
+
+class _Conversation:
+    def __init__(self, capacity):
+        self.messages = deque()
+        self.capacity = capacity
+        self.bytes = 0
+        # True when the buffer holds the *whole* conversation (DB had fewer rows)
+        self.complete = False
+        # Messages in the whole conversation, including those that fell out of the buffer
+        self.total = 0
+
+
+class HistoryCache:
+    """
+    In-process cache of recent messages, one ring buffer per conversation.
+
+    - `append()` is called on every write, so a warm conversation never
+      needs the database to build its context.
+    - `get()` returns None on a miss (unknown conversation, or the buffer
+      holds fewer messages than asked for); the caller then loads from the
+      database and calls `fill()`.
+    - Bounded by conversation count and by approximate memory, with LRU
+      eviction of whole conversations.
+    """
+    def __init__(self, max_conversations=1000, max_messages=50, max_bytes=64 * 1024 * 1024):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, conversation_id, limit):
+        """
+        Returns (the last `limit` messages oldest first, position of the first
+        one in the conversation), or None on a miss
+        """
+        with self._lock:
+            conv = self._data.get(conversation_id)
+            if conv is None or (len(conv.messages) < limit and not conv.complete):
+                self.misses += 1
+                return None
+            self._data.move_to_end(conversation_id)
+            self.hits += 1
+            messages = [dict(m) for m in list(conv.messages)[-limit:]] if limit else []
+            return messages, conv.total - len(messages)
+
+    def fill(self, conversation_id, messages, start=0, complete=False):
+        """Seeds a conversation from the database (messages oldest first, the first at position `start`)"""
+        with self._lock:
+            existing = self._data.get(conversation_id)
+            if existing is not None and len(existing.messages) >= len(messages):
+                # Another request already warmed it up, and may have appended since
+                return
+            if existing is not None:
+                self._drop(conversation_id)
+            conv = _Conversation(self.max_messages)
+            conv.complete = complete
+            conv.total = start
+            self._data[conversation_id] = conv
+            for message in messages:
+                self._push(conv, message)
+            self._evict()
+
+    def append(self, conversation_id, message):
+        """Records a newly written message. Cold conversations are left alone"""
+        with self._lock:
+            conv = self._data.get(conversation_id)
+            if conv is None:
+                # Without the older history the buffer would look complete when it isn't
+                return
+            self._data.move_to_end(conversation_id)
+            self._push(conv, message)
+            self._evict()
+
+    def invalidate(self, conversation_id):
+        with self._lock:
+            if conversation_id in self._data:
+                self._drop(conversation_id)
+
+    # --- Internals (call with the lock held) ---
+    def _push(self, conv, message):
+        message = {"role": message["role"], "content": message["content"]}
+        size = _message_size(message)
+        conv.messages.append(message)
+        conv.total += 1
+        conv.bytes += size
+        self._bytes += size
+        while len(conv.messages) > conv.capacity:
+            # Ring buffer: oldest message falls out, so the buffer no longer holds everything
+            old = conv.messages.popleft()
+            old_size = _message_size(old)
+            conv.bytes -= old_size
+            self._bytes -= old_size
+            conv.complete = False
+
+    def _drop(self, conversation_id):
+        conv = self._data.pop(conversation_id)
+        self._bytes -= conv.bytes
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_conversations or self._bytes > self.max_bytes):
+            oldest = next(iter(self._data))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "conversations": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,74 @@
+import os
+import json
+import hashlib
+import threading
+
+
+def file_hash(path, block_size=1 << 20):
+    """sha256 of a file, read in 1 MB blocks"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class IngestManifest:
+    """
+    What has been ingested, per source file:
+        {source: {"size", "mtime_ns", "file_hash", "chunks": {chunk_id: metadata}}}
+    Chunk ids are derived from chunk content, so an unchanged chunk keeps its
+    id (and its stored embedding) even when earlier pages shift.
+    Saved as JSON, written atomically.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.sources = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.sources = json.load(f)
+
+    def get(self, source):
+        return self.sources.get(source)
+
+    def is_unchanged(self, source, path):
+        """
+        Cheap check first (size + mtime), then the file hash.
+        Returns (unchanged, file_hash).
+        """
+        entry = self.sources.get(source)
+        st = os.stat(path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return True, entry["file_hash"]
+        digest = file_hash(path)
+        if entry and entry["file_hash"] == digest:
+            # Touched but identical: remember the new mtime so next time is free
+            entry["mtime_ns"] = st.st_mtime_ns
+            return True, digest
+        return False, digest
+
+    def record(self, source, path, digest, chunks):
+        st = os.stat(path)
+        with self._lock:
+            self.sources[source] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "file_hash": digest,
+                "chunks": chunks,
+            }
+
+    def forget(self, source):
+        with self._lock:
+            return self.sources.pop(source, None)
+
+    def save(self):
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.sources, f)
+            os.replace(tmp, self.path)
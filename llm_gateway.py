@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+
+import openai
+from tenacity import (
+    Retrying, AsyncRetrying, retry_if_exception, stop_after_attempt, stop_before_delay,
+    wait_random_exponential,
+)
+
+from metrics import Histogram
+
+_END = object()
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, dropped connections and 5xx; a bad request fails right away"""
+    return isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError))
+
+
+class _Abandoned(Exception):
+    """Handed to the waiters of a coalesced call whose owner was cancelled: they retry it"""
+
+
+def request_key(kwargs):
+    """Identical requests (same model, messages, options) get the same key"""
+    return hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(first, iterator):
+    """Sync stream whose first chunk was already read"""
+    if first is not _END:
+        yield first
+    yield from iterator
+
+
+class _StartedStream:
+    """
+    Async stream whose first chunk was already read: yields it, then the
+    rest. aclose() releases the connection (a hedge loser is closed unread).
+    """
+    def __init__(self, response, iterator, first):
+        self.response = response
+        self.iterator = iterator
+        self.first = first
+
+    async def __aiter__(self):
+        try:
+            if self.first is not _END:
+                yield self.first
+            async for chunk in self.iterator:
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        for close in (getattr(self.iterator, "aclose", None), getattr(self.response, "close", None)):
+            if close:
+                await close()
+
+
+class LLMGateway:
+    """
+    Every chat completion goes through here (the agent loop, /chat, /rag and
+    the summarizer). The client is passed per call, so one gateway serves
+    every agent in the process.
+
+    - Single flight: identical non-streaming requests in flight at the same
+      time share one upstream call (`coalesced` = calls saved). If the caller
+      making it is cancelled, a waiter makes the call instead.
+    - Retries: rate limits, timeouts, dropped connections and 5xx are retried
+      with jittered exponential backoff, up to `max_attempts`, and only while
+      the next attempt starts within `budget` seconds of the first. A stream
+      is retried until its first chunk, never once the caller has output.
+      `recovered` counts requests that only succeeded thanks to a retry.
+    - Hedging (async streams, `hedge=True`): if the first chunk hasn't come
+      after the p95 time-to-first-chunk (`hedge_after` until `hedge_min_samples`
+      streams were timed), a second attempt is started; the first to answer
+      wins and the other is closed. `hedge_wins` counts the hedges that won.
+    """
+    def __init__(self, budget=10.0, max_attempts=4, backoff=0.25, max_backoff=4.0,
+                 hedge=False, hedge_after=1.0, hedge_min_samples=20):
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.hedge_min_samples = hedge_min_samples
+        self._inflight = {}  # key -> Future, shared by sync and async callers
+        self._unretried = {}  # id(client) -> (client, copy with the SDK's retries off)
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.recovered = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.first_chunk = Histogram()
+
+    def _client(self, client):
+        """
+        The client with the SDK's own retries off (the gateway owns retries and
+        their budget), built once per client. Fakes without with_options() are used as is.
+        """
+        with self._lock:
+            entry = self._unretried.get(id(client))
+            if entry is None or entry[0] is not client:
+                with_options = getattr(client, "with_options", None)
+                entry = (client, with_options(max_retries=0) if with_options else client)
+                self._unretried[id(client)] = entry
+            return entry[1]
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _retrying(self, retrying_cls):
+        return retrying_cls(
+            retry=retry_if_exception(is_retryable),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.max_backoff),
+            stop=stop_after_attempt(self.max_attempts) | stop_before_delay(self.budget),
+            before_sleep=lambda state: self._count("retries"),
+            reraise=True,
+        )
+
+    def hedge_delay(self):
+        """How long a stream may take to its first chunk before it is hedged"""
+        if self.first_chunk.count < self.hedge_min_samples:
+            return self.hedge_after
+        return self.first_chunk.percentile(95)
+
+    # --- Single flight ---
+    def _join(self, kwargs):
+        """(key, future, owner): the in-flight call for this exact request, or a new one to run"""
+        key = request_key(kwargs)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return key, future, False
+            future = self._inflight[key] = Future()
+            return key, future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        """
+        Releases the key and hands the outcome to the waiters. An owner that was
+        cancelled (or interrupted) rather than failed hands them _Abandoned instead,
+        so the first of them takes the call over.
+        """
+        if error is not None and not isinstance(error, Exception):
+            error = _Abandoned()
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    # --- Sync ---
+    def create(self, client, **kwargs):
+        """client.chat.completions.create(**kwargs) with single flight and retries"""
+        self._count("requests")
+        if kwargs.get("stream"):
+            return self._call(client, kwargs)
+        while True:
+            key, future, owner = self._join(kwargs)
+            if owner:
+                break
+            try:
+                # Someone else is already making this exact call: wait for its result
+                return future.result()
+            except _Abandoned:
+                continue  # its owner gave up: make the call (or join whoever did)
+        try:
+            result = self._call(client, kwargs)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def _call(self, client, kwargs):
+        try:
+            for attempt in self._retrying(Retrying):
+                with attempt:
+                    result = self._open(client, kwargs)
+        except Exception:
+            self._count("failures")
+            raise
+        if attempt.retry_state.attempt_number > 1:
+            self._count("recovered")
+        return result
+
+    def _open(self, client, kwargs):
+        """One attempt; a stream is read up to its first chunk, so a failed start can be retried"""
+        self._count("upstream_calls")
+        start = time.perf_counter()
+        response = self._client(client).chat.completions.create(**kwargs)
+        if not kwargs.get("stream"):
+            return response
+        iterator = iter(response)
+        first = next(iterator, _END)
+        self.first_chunk.observe(time.perf_counter() - start)
+        return _replay(first, iterator)
+
+    # --- Async ---
+    async def acreate(self, client, **kwargs):
+        """Async create(): same single flight and retries, plus hedging for streams"""
+        self._count("requests")
+        if kwargs.get("stream"):
+            return await self._acall(client, kwargs)
+        while True:
+            key, future, owner = self._join(kwargs)
+            if owner:
+                break
+            try:
+                # Shielded: a waiter giving up must not cancel the owner's call
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _Abandoned:
+                continue  # the owner was cancelled: take the call over (or join whoever did)
+        try:
+            result = await self._acall(client, kwargs)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def _acall(self, client, kwargs):
+        attempt_once = self._aopen_hedged if self.hedge and kwargs.get("stream") else self._aopen
+        try:
+            async for attempt in self._retrying(AsyncRetrying):
+                with attempt:
+                    result = await attempt_once(client, kwargs)
+        except Exception:
+            self._count("failures")
+            raise
+        if attempt.retry_state.attempt_number > 1:
+            self._count("recovered")
+        return result
+
+    async def _aopen(self, client, kwargs):
+        self._count("upstream_calls")
+        start = time.perf_counter()
+        response = await self._client(client).chat.completions.create(**kwargs)
+        if not kwargs.get("stream"):
+            return response
+        stream = _StartedStream(response, response.__aiter__(), _END)
+        try:
+            stream.first = await stream.iterator.__anext__()
+        except StopAsyncIteration:
+            pass
+        except BaseException:
+            # Failed or cancelled (hedge loser) before the first chunk
+            await stream.aclose()
+            raise
+        self.first_chunk.observe(time.perf_counter() - start)
+        return stream
+
+    async def _aopen_hedged(self, client, kwargs):
+        """_aopen(), plus a second attempt if the first chunk is late; the first to answer wins"""
+        primary = asyncio.ensure_future(self._aopen(client, kwargs))
+        pending, winner = {primary}, None
+        try:
+            # Every exit, the caller being cancelled included, stops the attempts still running
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done:
+                return primary.result()
+            self._count("hedges")
+            backup = asyncio.ensure_future(self._aopen(client, kwargs))
+            pending = {primary, backup}
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if not t.exception()), None)
+                # Both finished at once: close the one that isn't used
+                for task in done:
+                    if task is not winner and not task.exception():
+                        await task.result().aclose()
+        finally:
+            for task in pending:
+                task.cancel()
+        if winner is None:
+            return primary.result()  # both failed: the retry loop decides
+        if winner is backup:
+            self._count("hedge_wins")
+        return winner.result()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "recovered": self.recovered,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_after": self.hedge_delay() if self.hedge else None,
+            "first_chunk": self.first_chunk.snapshot(),
+        }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """
+    Process-wide LLMGateway configured by LLM_RETRY_BUDGET (seconds, default
+    10), LLM_MAX_ATTEMPTS (4), LLM_HEDGE=1 and LLM_HEDGE_AFTER_MS (hedge
+    delay until enough streams were timed, default 1000).
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(
+                budget=float(os.environ.get("LLM_RETRY_BUDGET", "10")),
+                max_attempts=int(os.environ.get("LLM_MAX_ATTEMPTS", "4")),
+                hedge=os.environ.get("LLM_HEDGE") == "1",
+                hedge_after=float(os.environ.get("LLM_HEDGE_AFTER_MS", "1000")) / 1000,
+            )
+        return _gateway
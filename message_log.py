@@ -0,0 +1,125 @@
+import time
+import asyncio
+from metrics import Histogram
+
+
+class MessageLog:
+    """
+    Write-behind log for chat messages.
+
+    Requests only put rows on an in-memory queue. A single background task
+    groups them into bulk inserts, flushed when `batch_size` rows are waiting
+    or `flush_interval` seconds have passed, whichever comes first.
+
+    - Backpressure: the queue is bounded, so `write()` waits when the DB
+      falls too far behind instead of growing memory forever.
+    - Retry: a failed bulk insert is retried with exponential backoff.
+      After `max_retries` the batch is dropped and counted.
+    - Drain: `stop()` flushes everything still queued before returning.
+    """
+    def __init__(self, client, table="messages", batch_size=50, flush_interval=0.25,
+                 max_queue=10_000, max_retries=5, retry_backoff=0.1):
+        self.client = client
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+
+        # Metrics
+        self.flush_latency = Histogram()
+        self.batch_sizes = Histogram()
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flush_failures = 0
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flushes whatever is still queued, then stops the writer task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)  # sentinel: drain and exit
+        await self._task
+        self._task = None
+
+    # --- Producer side ---
+    async def write(self, row: dict):
+        """Queues a row. Only waits when the queue is full (backpressure)"""
+        if self._task is None:
+            # Not started (e.g. a script without the server lifespan): write through.
+            await self._insert_with_retry([row])
+            return
+        await self._queue.put(row)
+
+    # --- Consumer side ---
+    async def _next_batch(self):
+        """Waits for the first row, then collects more until size or time runs out"""
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if row is None:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if stopping:
+                # Drain: grab everything that was queued before the sentinel
+                while not self._queue.empty():
+                    row = self._queue.get_nowait()
+                    if row is not None:
+                        batch.append(row)
+            for i in range(0, len(batch), self.batch_size):
+                await self._insert_with_retry(batch[i:i + self.batch_size])
+
+    async def _insert_with_retry(self, rows):
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                # The Supabase client is blocking, so run it in a worker thread
+                await asyncio.to_thread(self._insert, rows)
+                self.flush_latency.observe(time.perf_counter() - start)
+                self.batch_sizes.observe(len(rows))
+                self.rows_written += len(rows)
+                return True
+            except Exception as e:
+                self.flush_failures += 1
+                print(f"Error saving to DB (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+        self.rows_dropped += len(rows)
+        return False
+
+    def _insert(self, rows):
+        self.client.table(self.table).insert(rows).execute()
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "flush_failures": self.flush_failures,
+            "batch_size": self.batch_sizes.snapshot(),
+            "flush_latency_s": self.flush_latency.snapshot(),
+        }
@@ -0,0 +1,116 @@
+import time
+import asyncio
+from tokens import count_tokens
+from metrics import Histogram
+from rerank import dedupe
+
+# Tokens of retrieved context allowed in one RAG prompt
+RAG_CONTEXT_BUDGET = 1500
+# Chunks retrieved per question, and how many of them the reranker keeps
+RAG_CANDIDATES = 20
+RAG_TOP_K = 5
+
+RAG_SYSTEM_PROMPT = (
+    "You are a helpful assistant. Answer the question using only the numbered context passages, "
+    "and cite the passages you used like [1] or [2]. If the answer is not in the context, "
+    "say \"I don't know.\" Answer in the language of the question."
+)
+
+
+def source_label(metadata):
+    """'invoice.pdf p. 3' (or 'pp. 3-4' for a chunk spanning pages)"""
+    metadata = metadata or {}
+    label = metadata.get("source", "unknown")
+    page, page_end = metadata.get("page"), metadata.get("page_end")
+    if page is not None:
+        label += f" p. {page}" if page_end in (None, page) else f" pp. {page}-{page_end}"
+    return label
+
+
+def pack_context(results, budget=RAG_CONTEXT_BUDGET, model="gpt-4o-mini"):
+    """
+    Numbers the retrieved chunks (best first) and keeps those that fit in
+    `budget` tokens. The best chunk is always kept, even if it alone is over
+    budget. Returns (context_text, sources); sources[i] is passage [i + 1].
+    """
+    passages, sources = [], []
+    used = 0
+    for result in results:
+        label = source_label(result["metadata"])
+        passage = f"[{len(passages) + 1}] ({label})\n{result['document']}"
+        cost = count_tokens(passage, model)
+        if passages and used + cost > budget:
+            continue  # a shorter chunk further down may still fit
+        passages.append(passage)
+        sources.append({"id": result["id"], "label": label, "metadata": result["metadata"]})
+        used += cost
+    return "\n\n".join(passages), sources
+
+
+def rag_messages(question, context):
+    """Prompt for one RAG answer: instructions, then the packed context and the question"""
+    return [
+        {"role": "system", "content": RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"},
+    ]
+
+
+def format_sources(sources):
+    """Citation footer streamed after the answer"""
+    if not sources:
+        return ""
+    return "\n\nSources:\n" + "\n".join(f"[{i}] {s['label']}" for i, s in enumerate(sources, start=1))
+
+
+class RagPipeline:
+    """
+    Query-time pipeline: retrieve -> rerank -> dedupe -> pack.
+
+    The hybrid retriever fetches `candidates` chunks, the reranker keeps the
+    best `k`, overlapping neighbours are merged and the result is packed
+    into `budget` tokens. Several chunks reach the prompt, so an answer whose
+    best chunk ranked second or third is still right. Per-stage latencies
+    are returned with each run and kept as histograms.
+    """
+    STAGES = ("embed", "vector", "lexical", "fusion", "retrieval", "rerank", "dedupe", "pack", "total")
+
+    def __init__(self, retriever, reranker=None, candidates=RAG_CANDIDATES, k=RAG_TOP_K,
+                 budget=RAG_CONTEXT_BUDGET):
+        self.retriever = retriever
+        self.reranker = reranker    # MMRReranker / CrossEncoderReranker (None: retrieval order)
+        self.candidates = candidates
+        self.k = k
+        self.budget = budget
+        self.latency = {stage: Histogram() for stage in self.STAGES}
+
+    def _finish(self, question, results, timings, k):
+        """Rerank, dedupe and pack retrieved candidates. Returns (context, sources, timings_ms)"""
+        timings["retrieval"] = timings.pop("total")
+        t = time.perf_counter()
+        results = self.reranker.rerank(question, results, k) if self.reranker else results[:k]
+        timings["rerank"] = (time.perf_counter() - t) * 1e3
+
+        t = time.perf_counter()
+        results = dedupe(results)
+        timings["dedupe"] = (time.perf_counter() - t) * 1e3
+
+        t = time.perf_counter()
+        context, sources = pack_context(results, self.budget)
+        timings["pack"] = (time.perf_counter() - t) * 1e3
+
+        timings["total"] = sum(timings[stage] for stage in ("retrieval", "rerank", "dedupe", "pack"))
+        for stage, ms in timings.items():
+            self.latency[stage].observe(ms / 1e3)
+        return context, sources, timings
+
+    def run(self, question, k=None):
+        results, timings = self.retriever.search(question, k=self.candidates)
+        return self._finish(question, results, timings, k or self.k)
+
+    async def arun(self, question, k=None):
+        results, timings = await self.retriever.asearch(question, k=self.candidates)
+        # Cross-encoder inference is CPU work: keep it off the event loop
+        return await asyncio.to_thread(self._finish, question, results, timings, k or self.k)
+
+    def stats(self):
+        return {stage: h.snapshot() for stage, h in self.latency.items()}
@@ -0,0 +1,176 @@
+import os
+import re
+import numpy as np
+from vector_index import normalize
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:  # optional: only the cross-encoder needs them
+    onnxruntime = None
+
+# Chunks whose word 3-grams overlap this much are treated as the same passage
+NEAR_DUPLICATE = 0.8
+
+
+# --- De-duplication ---
+def _shingles(text, n=3):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+
+
+def _overlap(a, b, probe=20):
+    """Length of the longest suffix of `a` that `b` starts with (the chunker's overlap)"""
+    if len(b) < probe:
+        return 0
+    start = a.find(b[:probe])
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(b[:probe], start + 1)
+    return 0
+
+
+def _merge(run):
+    """One passage from consecutive chunks of a document, without the repeated overlap"""
+    text = run[0]["document"]
+    for result in run[1:]:
+        overlap = _overlap(text, result["document"])
+        text += result["document"][overlap:] if overlap else " " + result["document"]
+    pages = [r["metadata"].get("page") for r in run if r["metadata"].get("page") is not None]
+    ends = [r["metadata"].get("page_end", r["metadata"].get("page")) for r in run]
+    metadata = dict(run[0]["metadata"])
+    if pages:
+        metadata["page"] = min(pages)
+        metadata["page_end"] = max(e for e in ends if e is not None)
+    best = max(run, key=lambda r: r["score"])
+    return dict(best, document=text, metadata=metadata, ids=[r["id"] for r in run])
+
+
+def dedupe(results, near_duplicate=NEAR_DUPLICATE):
+    """
+    Drops (near-)duplicate chunks and merges neighbouring chunks of the same
+    document (chunk_index i, i + 1, ...) into one passage, so the overlap
+    the chunker repeats is only packed once. Keeps the input (rank) order.
+    """
+    kept, seen = [], []
+    for result in results:
+        shingles = _shingles(result["document"])
+        if any(len(shingles & s) / len(shingles | s) >= near_duplicate for s in seen):
+            continue
+        kept.append(result)
+        seen.append(shingles)
+
+    position = {
+        (r["metadata"].get("source"), r["metadata"].get("chunk_index")): i
+        for i, r in enumerate(kept) if r["metadata"] and r["metadata"].get("chunk_index") is not None
+    }
+    used, out = set(), []
+    for i, result in enumerate(kept):
+        if i in used:
+            continue
+        metadata = result["metadata"] or {}
+        if metadata.get("chunk_index") is None:
+            used.add(i)
+            out.append(result)
+            continue
+        source, index = metadata.get("source"), metadata["chunk_index"]
+        while (source, index - 1) in position and position[(source, index - 1)] not in used:
+            index -= 1
+        run = []
+        while (source, index) in position and position[(source, index)] not in used:
+            used.add(position[(source, index)])
+            run.append(kept[position[(source, index)]])
+            index += 1
+        out.append(_merge(run) if len(run) > 1 else run[0])
+    return out
+
+
+# --- Rerankers: rerank(query, results, k) -> best k results, best first ---
+class MMRReranker:
+    """
+    Maximal marginal relevance over the retrieved candidates: each pick
+    maximizes lambda * relevance - (1 - lambda) * similarity to the chunks
+    already picked, so near-identical chunks don't crowd out the second or
+    third best answer. Relevance is the fused retrieval score; similarities
+    come from the stored chunk embeddings. No model, no network.
+    """
+    def __init__(self, collection, lambda_mult=0.7):
+        self.collection = collection
+        self.lambda_mult = lambda_mult
+
+    def rerank(self, query, results, k):
+        if len(results) <= 1:
+            return results[:k]
+        stored = self.collection.get(ids=[r["id"] for r in results], include=["embeddings"])
+        vectors = dict(zip(stored["ids"], stored["embeddings"]))
+        if any(r["id"] not in vectors for r in results):
+            return results[:k]  # chunk removed meanwhile: keep the retrieval order
+        matrix = normalize([vectors[r["id"]] for r in results])
+        similarity = matrix @ matrix.T
+
+        scores = np.array([r["score"] for r in results], dtype=np.float32)
+        spread = scores.max() - scores.min()
+        relevance = (scores - scores.min()) / spread if spread else np.ones_like(scores)
+
+        picked, redundancy = [], np.zeros(len(results), dtype=np.float32)
+        available = np.ones(len(results), dtype=bool)
+        for _ in range(min(k, len(results))):
+            mmr = self.lambda_mult * relevance - (1 - self.lambda_mult) * redundancy
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            picked.append((best, float(mmr[best])))
+            available[best] = False
+            redundancy = np.maximum(redundancy, similarity[best])
+        return [dict(results[i], rerank_score=score) for i, score in picked]
+
+
+class CrossEncoderReranker:
+    """
+    Small ONNX cross-encoder (e.g. ms-marco-MiniLM-L-6-v2 exported to ONNX)
+    that reads the question and each chunk together, scored in batches on CPU.
+    `model_dir` holds model.onnx and tokenizer.json.
+    """
+    def __init__(self, model_dir, batch_size=16, max_length=512, threads=None):
+        if onnxruntime is None:
+            raise ImportError("The cross-encoder needs onnxruntime and tokenizers")
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def score(self, query, documents):
+        scores = []
+        for i in range(0, len(documents), self.batch_size):
+            encoded = self.tokenizer.encode_batch([(query, d) for d in documents[i:i + self.batch_size]])
+            feed = {
+                "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encoded], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encoded], dtype=np.int64),
+            }
+            logits = self.session.run(None, {name: v for name, v in feed.items() if name in self.inputs})[0]
+            # One relevance logit, or (not relevant, relevant) pairs: the last column either way
+            scores.append(logits.reshape(len(encoded), -1)[:, -1])
+        return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+    def rerank(self, query, results, k):
+        if not results:
+            return []
+        scores = self.score(query, [r["document"] for r in results])
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [dict(results[i], rerank_score=float(scores[i])) for i in order]
+
+
+def get_reranker(collection):
+    """Cross-encoder when RERANK_MODEL_DIR points to one, otherwise MMR"""
+    model_dir = os.environ.get("RERANK_MODEL_DIR")
+    if model_dir:
+        return CrossEncoderReranker(model_dir)
+    return MMRReranker(collection)
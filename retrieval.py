@@ -0,0 +1,119 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from metrics import Histogram
+
+RRF_K = 60  # standard reciprocal-rank-fusion constant
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Merges ranked id lists: score(id) = sum over lists of 1 / (k + rank).
+    Rank-based, so BM25 and cosine scores never need to be calibrated.
+    Returns [(id, score), ...] best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+class HybridRetriever:
+    """
+    Dense + lexical retrieval over one collection.
+
+    The BM25 lookup runs on a worker thread while the query is embedded and
+    the vector store is queried; both candidate lists are merged by
+    reciprocal-rank fusion. Documents found only by BM25 are fetched from
+    the collection. Per-stage latencies are returned with each result and
+    kept as histograms.
+    """
+    def __init__(self, collection, lexical, embed, candidates=20, aembed=None):
+        self.collection = collection
+        self.lexical = lexical      # BM25Index (or None for dense only)
+        self.embed = embed          # fn(text) -> list[float]
+        self.aembed = aembed        # async fn(text) -> list[float], for asearch()
+        self.candidates = candidates
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lexical")
+        self.latency = {stage: Histogram() for stage in ("embed", "vector", "lexical", "fusion", "total")}
+
+    def _lexical(self, query):
+        start = time.perf_counter()
+        hits = self.lexical.search(query, self.candidates) if self.lexical is not None else []
+        return hits, time.perf_counter() - start
+
+    def _query(self, vector):
+        start = time.perf_counter()
+        dense = self.collection.query(query_embeddings=[vector], n_results=self.candidates)
+        return dense, time.perf_counter() - start
+
+    def search(self, query, k=5):
+        """
+        Returns (results, timings_ms). Each result is a dict with id, document,
+        metadata, score (fused), vector_rank and lexical_rank (None if absent).
+        """
+        start = time.perf_counter()
+        lexical_future = self._pool.submit(self._lexical, query)
+
+        t = time.perf_counter()
+        vector = self.embed(query)
+        timings = {"embed": time.perf_counter() - t}
+
+        dense, timings["vector"] = self._query(vector)
+        lexical_hits, timings["lexical"] = lexical_future.result()
+        return self._fuse(dense, lexical_hits, k, timings, start)
+
+    async def asearch(self, query, k=5):
+        """search() for the event loop: awaits the async embedder, store calls run on threads"""
+        start = time.perf_counter()
+        lexical_future = asyncio.wrap_future(self._pool.submit(self._lexical, query))
+
+        t = time.perf_counter()
+        vector = await self.aembed(query) if self.aembed else await asyncio.to_thread(self.embed, query)
+        timings = {"embed": time.perf_counter() - t}
+
+        dense, timings["vector"] = await asyncio.to_thread(self._query, vector)
+        lexical_hits, timings["lexical"] = await lexical_future
+        return await asyncio.to_thread(self._fuse, dense, lexical_hits, k, timings, start)
+
+    def _fuse(self, dense, lexical_hits, k, timings, start):
+        t = time.perf_counter()
+        dense_ids = dense["ids"][0]
+        lexical_ids = [chunk_id for chunk_id, _ in lexical_hits]
+        fused = reciprocal_rank_fusion([dense_ids, lexical_ids])[:k]
+
+        found = {
+            chunk_id: (doc, meta)
+            for chunk_id, doc, meta in zip(dense_ids, dense["documents"][0], dense["metadatas"][0])
+        }
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in found]
+        if missing:
+            extra = self.collection.get(ids=missing)
+            found.update({
+                chunk_id: (doc, meta)
+                for chunk_id, doc, meta in zip(extra["ids"], extra["documents"], extra["metadatas"])
+            })
+        dense_rank = {chunk_id: r for r, chunk_id in enumerate(dense_ids, start=1)}
+        lexical_rank = {chunk_id: r for r, chunk_id in enumerate(lexical_ids, start=1)}
+        results = [
+            {
+                "id": chunk_id,
+                "document": found[chunk_id][0],
+                "metadata": found[chunk_id][1],
+                "score": score,
+                "vector_rank": dense_rank.get(chunk_id),
+                "lexical_rank": lexical_rank.get(chunk_id),
+            }
+            for chunk_id, score in fused
+            if chunk_id in found  # stale BM25 entry whose chunk is gone
+        ]
+        timings["fusion"] = time.perf_counter() - t
+        timings["total"] = time.perf_counter() - start
+
+        for stage, seconds in timings.items():
+            self.latency[stage].observe(seconds)
+        return results, {stage: seconds * 1e3 for stage, seconds in timings.items()}
+
+    def stats(self):
+        return {stage: h.snapshot() for stage, h in self.latency.items()}
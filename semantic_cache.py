@@ -0,0 +1,148 @@
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from metrics import Histogram
+
+
+def context_digest(messages, last_n=2):
+    """
+    Short hash of the last few messages before the prompt.
+    Answers are only reused between turns whose recent context matches,
+    so "and in Paris?" is never answered from another conversation.
+    """
+    h = hashlib.sha1()
+    for m in messages[-last_n:] if last_n else []:
+        h.update(f"{m['role']}\x00{' '.join((m.get('content') or '').lower().split())}\x01".encode("utf-8"))
+    return int.from_bytes(h.digest()[:8], "little", signed=True)
+
+
+def stream_answer(answer, words_per_chunk=3):
+    """Replays a cached answer as a stream of small text chunks"""
+    words = re.findall(r"\S+\s*", answer)
+    for i in range(0, len(words), words_per_chunk):
+        yield "".join(words[i:i + words_per_chunk])
+
+
+class _Entry:
+    __slots__ = ("prompt", "answer", "generation_s")
+
+    def __init__(self, prompt, answer, generation_s):
+        self.prompt = prompt
+        self.answer = answer
+        self.generation_s = generation_s
+
+
+class SemanticCache:
+    """
+    Reuses answers for near-duplicate prompts.
+
+    Prompt embeddings are stored normalized in one preallocated float32
+    matrix, so a lookup is a single matrix-vector product over all slots,
+    masked to live entries with the same context digest. A hit is a cosine
+    similarity of at least `threshold`. Slots are recycled LRU-first once
+    the cache is full; entries expire after `ttl` seconds.
+    """
+    def __init__(self, embed, threshold=0.95, ttl=3600, max_entries=5000):
+        self.embed = embed            # async fn(text) -> list[float]
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._vectors = None          # (max_entries, dim), allocated on first insert
+        self._digests = np.zeros(max_entries, dtype=np.int64)
+        self._expires = np.zeros(max_entries, dtype=np.float64)  # 0 = free slot
+        self._entries = [None] * max_entries
+        self._lru = OrderedDict()     # slot -> None, oldest first
+        self._free = []               # invalidated slots
+        self._next_slot = 0           # slots below this have been used at least once
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved_s = 0.0
+        self.embed_latency = Histogram()
+
+    async def embed_prompt(self, prompt):
+        """Normalized prompt embedding, or None if the embedding call failed"""
+        start = time.perf_counter()
+        try:
+            vector = np.asarray(await self.embed(prompt), dtype=np.float32)
+        except Exception as e:
+            print(f"Error embedding prompt: {e}")
+            return None
+        self.embed_latency.observe(time.perf_counter() - start)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector, digest):
+        """Returns the cached answer for the closest live prompt, or None"""
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return None
+            n = self._next_slot
+            live = (self._expires[:n] > time.time()) & (self._digests[:n] == digest)
+            if not live.any():
+                self.misses += 1
+                return None
+            scores = np.where(live, self._vectors[:n] @ vector, -np.inf)
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                self.misses += 1
+                return None
+            entry = self._entries[slot]
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            self.latency_saved_s += entry.generation_s
+            return entry.answer
+
+    def store(self, vector, digest, prompt, answer, generation_s):
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._free_slot()
+            self._vectors[slot] = vector
+            self._digests[slot] = digest
+            self._expires[slot] = time.time() + self.ttl
+            self._entries[slot] = _Entry(prompt, answer, generation_s)
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+
+    def _free_slot(self):
+        if self._free:
+            return self._free.pop()
+        if self._next_slot < self.max_entries:
+            self._next_slot += 1
+            return self._next_slot - 1
+        # Full: recycle an expired slot, else the least recently used one
+        expired = np.flatnonzero(self._expires <= time.time())
+        if len(expired):
+            slot = int(expired[0])
+            self._lru.pop(slot, None)
+            return slot
+        slot, _ = self._lru.popitem(last=False)
+        return slot
+
+    def invalidate(self, predicate=None):
+        """Drops every entry, or the ones whose (prompt, answer) match `predicate`"""
+        with self._lock:
+            for slot in list(self._lru):
+                entry = self._entries[slot]
+                if predicate is None or predicate(entry.prompt, entry.answer):
+                    self._expires[slot] = 0
+                    self._entries[slot] = None
+                    del self._lru[slot]
+                    self._free.append(slot)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": int((self._expires > time.time()).sum()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_s": self.latency_saved_s,
+            "embed_latency_s": self.embed_latency.snapshot(),
+        }
@@ -0,0 +1,203 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tokens import message_field, message_tokens
+from llm_gateway import get_gateway
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Update the summary with the new messages below. Keep every fact, name, number, decision "
+    "and open question the assistant may need later; drop greetings and filler. "
+    "Write at most {max_words} words. Reply with the summary only."
+)
+
+
+def _as_text(message):
+    role = message_field(message, "role")
+    content = message_field(message, "content") or ""
+    calls = message_field(message, "tool_calls") or []
+    if calls:
+        names = ", ".join(message_field(message_field(c, "function"), "name") for c in calls)
+        content = f"{content} [called tools: {names}]".strip()
+    return f"{role}: {content}"
+
+
+def summary_message(text):
+    """The summary as it is injected into the prompt"""
+    return {"role": "system", "content": f"Summary of the earlier conversation:\n{text}"}
+
+
+class Summarizer:
+    """
+    Folds older turns into a compact running summary.
+
+    Once the unsummarized messages cost more than `trigger_tokens`, everything
+    except the newest `keep_recent_tokens` worth of messages is sent to the
+    model together with the previous summary, and replaced by the new summary.
+    The call is blocking; callers run it in the background.
+    """
+    def __init__(self, client, model="gpt-4o-mini", trigger_tokens=2000,
+                 keep_recent_tokens=800, max_words=250):
+        self.client = client
+        self.model = model
+        self.trigger_tokens = trigger_tokens
+        self.keep_recent_tokens = keep_recent_tokens
+        self.max_words = max_words
+
+    def split(self, messages):
+        """
+        Returns (older, recent) when a fold is due, else None.
+        `recent` never starts with a tool result, so tool calls stay with their results.
+        """
+        costs = [message_tokens(m, self.model) for m in messages]
+        if sum(costs) <= self.trigger_tokens:
+            return None
+        used = 0
+        cut = len(messages)
+        while cut > 0 and used + costs[cut - 1] <= self.keep_recent_tokens:
+            cut -= 1
+            used += costs[cut]
+        while cut < len(messages) and message_field(messages[cut], "role") == "tool":
+            cut += 1
+        if cut == 0:
+            return None
+        return messages[:cut], messages[cut:]
+
+    def summarize(self, previous_summary, messages):
+        """One LLM call: previous summary + older messages -> new summary"""
+        transcript = "\n".join(_as_text(m) for m in messages)
+        prompt = f"Current summary:\n{previous_summary or '(empty)'}\n\nNew messages:\n{transcript}"
+        # Identical folds in flight (same summary + messages) share one call
+        response = get_gateway().create(
+            self.client,
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(max_words=self.max_words)},
+                {"role": "user", "content": prompt},
+            ],
+        )
+        return response.choices[0].message.content.strip()
+
+
+class ConversationSummaries:
+    """
+    Running summaries for many conversations (used by the API).
+
+    Each summary remembers how many messages of the conversation it covers
+    (`summarized`), so a history window starting at message number `start`
+    can be split into "already summarized" and "still raw". A position, not
+    a content digest: short replies like "ok" repeat.
+    Summaries live in memory (LRU-bounded) and are persisted in the
+    `conversation_summaries` table next to the messages.
+    Background folds run on their own `fold_workers` threads, so a slow
+    summary call never holds a worker of the event loop's default executor.
+    """
+    def __init__(self, summarizer, db=None, table="conversation_summaries", max_conversations=1000,
+                 fold_workers=2):
+        self.summarizer = summarizer
+        self.db = db
+        self.table = table
+        self.max_conversations = max_conversations
+        self._data = OrderedDict()   # conversation_id -> {"summary": str, "summarized": int}
+        self._running = set()        # folds queued or running, at most one per conversation
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=fold_workers, thread_name_prefix="summary")
+
+        self.folds = 0
+        self.fold_failures = 0
+
+    def is_loaded(self, conversation_id):
+        with self._lock:
+            return conversation_id in self._data
+
+    def load(self, conversation_id):
+        """Returns the stored summary state, reading the database on a miss"""
+        with self._lock:
+            if conversation_id in self._data:
+                self._data.move_to_end(conversation_id)
+                return self._data[conversation_id]
+        state = None
+        if self.db is not None:
+            try:
+                rows = (
+                    self.db.table(self.table).select("*")
+                    .eq("conversation_id", conversation_id).limit(1).execute()
+                ).data
+                if rows:
+                    state = {"summary": rows[0]["summary"], "summarized": rows[0]["summarized"]}
+            except Exception as e:
+                print(f"Error fetching summary: {e}")
+        self._remember(conversation_id, state)
+        return state
+
+    def apply(self, conversation_id, history, start):
+        """
+        Splits a history window into (summary_text, unsummarized messages).
+        `start` is the position of history[0] in the whole conversation.
+        Call load() first (off the event loop) so this never touches the database.
+        """
+        with self._lock:
+            state = self._data.get(conversation_id)
+        if not state:
+            return None, history
+        # A summary that stops before the window leaves everything shown unsummarized
+        cut = min(max(state["summarized"] - start, 0), len(history))
+        return state["summary"], history[cut:]
+
+    def fold_later(self, conversation_id, history, start):
+        """
+        Folds older messages of `history` into the summary if due, on the summary pool.
+        Skipped when a fold is already queued for the conversation.
+        """
+        with self._lock:
+            if conversation_id in self._running:
+                return None
+            self._running.add(conversation_id)
+        return self._executor.submit(self._fold, conversation_id, history, start)
+
+    def _fold(self, conversation_id, history, start):
+        try:
+            previous, raw = self.apply(conversation_id, history, start)
+            parts = self.summarizer.split(raw)
+            if parts is None:
+                return False
+            older, _recent = parts
+            summary = self.summarizer.summarize(previous, older)
+            raw_start = start + len(history) - len(raw)
+            state = {"summary": summary, "summarized": raw_start + len(older)}
+            self._remember(conversation_id, state)
+            self._persist(conversation_id, state)
+            self.folds += 1
+            return True
+        except Exception as e:
+            self.fold_failures += 1
+            print(f"Error summarizing conversation: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._running.discard(conversation_id)
+
+    def _remember(self, conversation_id, state):
+        with self._lock:
+            self._data[conversation_id] = state
+            self._data.move_to_end(conversation_id)
+            while len(self._data) > self.max_conversations:
+                self._data.popitem(last=False)
+
+    def _persist(self, conversation_id, state):
+        if self.db is None:
+            return
+        try:
+            self.db.table(self.table).upsert(
+                {"conversation_id": conversation_id, **state}, on_conflict="conversation_id"
+            ).execute()
+        except Exception as e:
+            print(f"Error saving summary: {e}")
+
+    def stats(self):
+        return {
+            "conversations": len(self._data),
+            "folds": self.folds,
+            "fold_failures": self.fold_failures,
+            "running": len(self._running),
+        }
@@ -0,0 +1,60 @@
+import os
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("SUPABASE_FAKE", "1")
+
+import api
+
+
+class RecordingAsyncOpenAI:
+    """Streams a fixed answer and records the messages of every request"""
+    def __init__(self):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, messages, **kwargs):
+        self.prompts.append([dict(m) for m in messages])
+        return self._stream()
+
+    async def _stream(self):
+        delta = SimpleNamespace(content="noted " * 200, tool_calls=None)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeSummaryClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        message = SimpleNamespace(content="summary of the earlier turns")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_chat_keeps_the_current_message_after_folds(monkeypatch):
+    fake = RecordingAsyncOpenAI()
+    monkeypatch.setattr(api.agent, "async_client", fake)
+    monkeypatch.setattr(api.summaries.summarizer, "client", FakeSummaryClient())
+
+    async def run():
+        api.message_log.start()
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for turn in range(8):
+                prompt = f"question {turn}: " + "tell me more about this topic " * 40
+                response = await client.post("/chat", json={"prompt": prompt, "conversation_id": "regression"})
+                assert response.status_code == 200
+                # Folds run in the background: let each one finish before the next turn
+                while api.summaries.stats()["running"]:
+                    await asyncio.sleep(0.01)
+                last_user = [m for m in fake.prompts[-1] if m["role"] == "user"][-1]
+                assert last_user["content"] == prompt
+        await api.message_log.stop()
+
+    asyncio.run(run())
+    assert api.summaries.stats()["folds"] >= 1
+    assert api.summaries.stats()["fold_failures"] == 0
+    assert isinstance(api.summaries.load("regression")["summarized"], int)
@@ -0,0 +1,36 @@
+import asyncio
+from types import SimpleNamespace
+
+from llm_gateway import LLMGateway
+
+
+class SlowAsyncOpenAI:
+    """Answers every non-streaming request after a short delay, and counts them"""
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+
+def test_waiters_take_over_when_the_owner_is_cancelled():
+    client, gateway = SlowAsyncOpenAI(), LLMGateway()
+    request = {"model": "m", "messages": [{"role": "user", "content": "summarize this"}]}
+
+    async def run():
+        owner = asyncio.create_task(gateway.acreate(client, **request))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(gateway.acreate(client, **request)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        return owner, await asyncio.gather(*waiters)
+
+    owner, results = asyncio.run(run())
+    assert owner.cancelled()
+    assert results == ["answer"] * 3
+    # One waiter made the call again, the others shared it
+    assert client.calls == 2
+    assert not gateway._inflight
@@ -0,0 +1,37 @@
+import json
+import numpy as np
+import pytest
+
+from vector_store import LocalVectorStore, VECTORS, SCALES, IDS, RECORDS
+
+
+def _vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_interrupted_append_is_discarded_on_open(tmp_path, dtype):
+    store = LocalVectorStore(str(tmp_path), dtype=dtype)
+    vectors = _vectors(4)
+    store.upsert(["a", "b", "c"], embeddings=vectors[:3].tolist(), documents=["A", "B", "C"])
+
+    # Crash mid-append: one vector row, one record and one id are written, the offset never is
+    with open(tmp_path / VECTORS, "ab") as f:
+        f.write(b"\x07" * store.dim * np.dtype(dtype).itemsize)
+    if dtype == "int8":
+        with open(tmp_path / SCALES, "ab") as f:
+            np.float32(1.0).tofile(f)
+    with open(tmp_path / RECORDS, "ab") as f:
+        f.write(json.dumps({"id": "zzz", "document": "Z", "metadata": None}).encode() + b"\n")
+    with open(tmp_path / IDS, "a", encoding="utf-8") as f:
+        f.write(json.dumps("zzz") + "\n")
+
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert(["d"], embeddings=vectors[3:].tolist(), documents=["D"])
+
+    store = LocalVectorStore(str(tmp_path))
+    assert store._ids == ["a", "b", "c", "d"]
+    assert store.get(ids=["d"])["documents"] == ["D"]
+    result = store.query(query_embeddings=vectors[3:].tolist(), n_results=1)
+    assert result["ids"] == [["d"]]
+    assert result["documents"] == [["D"]]
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # in requirements.txt; without it, fall back to a character-based estimate
+    tiktoken = None
+
+# Chat format overhead per message (role, separators), as documented by OpenAI
+TOKENS_PER_MESSAGE = 4
+
+# Token counts of recently seen texts, keyed by a 16-byte digest: memory is
+# bounded by the entry count, whatever the size of the texts
+COUNT_CACHE_ENTRIES = 65536
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    """tiktoken encoding of the model, or None (estimate) when tiktoken or its encoding files are unavailable"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # The encoding is downloaded on first use: offline hosts fall back to the estimate
+        print(f"tiktoken unavailable, estimating token counts: {e}")
+        return None
+
+
+def _estimate(text):
+    # ~4 characters per token for English; other scripts (Arabic) take far
+    # more tokens per character, so they are counted at ~2 per token
+    ascii_chars = sum(1 for ch in text if ch < "\x80")
+    return ascii_chars // 4 + (len(text) - ascii_chars) // 2 + 1
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """
+    Number of tokens in `text`.
+    Cached, because the same history messages are counted again every turn.
+    """
+    if not text:
+        return 0
+    key = (hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(), model)
+    with _counts_lock:
+        count = _counts.get(key)
+        if count is not None:
+            _counts.move_to_end(key)
+            return count
+    encoding = _encoding(model)
+    count = len(encoding.encode(text)) if encoding else _estimate(text)
+    with _counts_lock:
+        _counts[key] = count
+        while len(_counts) > COUNT_CACHE_ENTRIES:
+            _counts.popitem(last=False)
+    return count
+
+
+def clear_count_cache():
+    with _counts_lock:
+        _counts.clear()
+
+
+def message_field(message, name):
+    # History holds plain dicts, but the agent also stores SDK message objects
+    if isinstance(message, dict):
+        return message.get(name)
+    return getattr(message, name, None)
+
+
+def message_tokens(message, model="gpt-4o-mini"):
+    """Tokens one chat message costs in a prompt (content + tool calls + overhead)"""
+    total = TOKENS_PER_MESSAGE + count_tokens(message_field(message, "content") or "", model)
+    for call in message_field(message, "tool_calls") or []:
+        function = message_field(call, "function")
+        total += count_tokens(message_field(function, "name") or "", model)
+        total += count_tokens(message_field(function, "arguments") or "", model)
+    return total
+
+
+def fit_to_budget(messages, budget, model="gpt-4o-mini"):
+    """
+    Keeps the most recent messages that fit in `budget` tokens (oldest first).
+    The newest message is always kept, even if it alone is over budget.
+    Tool results are never left without the assistant message that requested them.
+    """
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        cost = message_tokens(message, model)
+        if kept and used + cost > budget:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+
+    # A window starting with tool results would be rejected by the API
+    while len(kept) > 1 and message_field(kept[0], "role") == "tool":
+        kept.pop(0)
+    return kept
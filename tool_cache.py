@@ -0,0 +1,152 @@
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def normalize_args(args):
+    """Lower-cases and collapses whitespace in string arguments, recursively"""
+    if isinstance(args, str):
+        return " ".join(args.lower().split())
+    if isinstance(args, dict):
+        return {k: normalize_args(v) for k, v in args.items()}
+    if isinstance(args, (list, tuple)):
+        return [normalize_args(v) for v in args]
+    return args
+
+
+def cache_key(tool_name, args):
+    """'search_internet:{"query": "openai ceo"}' for any casing/spacing of the query"""
+    return f"{tool_name.strip().lower()}:{json.dumps(normalize_args(args or {}), sort_keys=True)}"
+
+
+class ToolCache:
+    """
+    TTL + LRU cache for tool results, shared by every agent in the process.
+
+    - TTLs are per tool (`ttls`); a TTL of 0 means "never cache" (e.g. the clock).
+    - Concurrent calls with the same key are coalesced: one thread runs the
+      tool, the others wait for its result (single flight).
+    - With `db_path`, results are also kept in SQLite so they survive restarts.
+    - Exceptions are never cached.
+    """
+    def __init__(self, ttls=None, default_ttl=0, max_entries=1024, db_path=None):
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._inflight = {}             # key -> Future
+        self._lock = threading.Lock()
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._db.commit()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def ttl(self, tool_name):
+        return self.ttls.get(tool_name, self.default_ttl)
+
+    def get_or_call(self, tool_name, args, fn):
+        """Returns the cached result for (tool_name, args), or runs fn() once to get it"""
+        ttl = self.ttl(tool_name)
+        if ttl <= 0:
+            return fn()
+        key = cache_key(tool_name, args)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        if not owner:
+            # Someone else is already running this exact call: wait for its result
+            return future.result()
+
+        try:
+            value = self._disk_get(key, now)
+            if value is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                value = fn()
+                self._disk_put(key, value, now + ttl)
+            with self._lock:
+                self._entries[key] = (now + ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, tool_name=None):
+        """Drops every entry, or only those of one tool"""
+        prefix = f"{tool_name.strip().lower()}:" if tool_name else ""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM tool_cache WHERE key LIKE ?", (prefix + "%",))
+                self._db.commit()
+
+    # --- SQLite tier ---
+    def _disk_get(self, key, now):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM tool_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        return json.loads(row[0])
+
+    def _disk_put(self, key, value, expires_at):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,152 @@
+import time
+import asyncio
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Literal, get_args, get_origin, get_type_hints
+from metrics import Histogram
+
+# Python type -> JSON schema type
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+}
+
+
+def _param_schema(annotation):
+    """JSON schema for one parameter. Annotated[str, "desc"] adds a description"""
+    description = None
+    if get_origin(annotation) is Annotated:
+        annotation, *extra = get_args(annotation)
+        description = next((e for e in extra if isinstance(e, str)), None)
+    if get_origin(annotation) is Literal:
+        values = list(get_args(annotation))
+        schema = {"type": _JSON_TYPES.get(type(values[0]), "string"), "enum": values}
+    else:
+        schema = {"type": _JSON_TYPES.get(get_origin(annotation) or annotation, "string")}
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def build_schema(fn, name, description=None):
+    """OpenAI function-calling schema from a function signature + docstring"""
+    hints = get_type_hints(fn, include_extras=True)
+    properties, required = {}, []
+    for param in inspect.signature(fn).parameters.values():
+        properties[param.name] = _param_schema(hints.get(param.name, str))
+        if param.default is inspect.Parameter.empty:
+            required.append(param.name)
+
+    doc = inspect.getdoc(fn) or ""
+    function = {"name": name, "description": description or doc.split("\n")[0]}
+    if properties:
+        function["parameters"] = {"type": "object", "properties": properties, "required": required}
+    return {"type": "function", "function": function}
+
+
+class Tool:
+    """
+    A registered tool: the function, its schema and its runtime limits/metrics.
+    A tool with max_concurrency gets its own executor of that many threads;
+    callers submit to it, so queued calls wait in its queue instead of
+    holding threads of a shared pool.
+    """
+    def __init__(self, fn, name, schema, timeout, max_concurrency, cache_ttl):
+        self.fn = fn
+        self.name = name
+        self.schema = schema
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.is_async = inspect.iscoroutinefunction(fn)
+        self.executor = None
+        if max_concurrency:
+            self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"tool-{name}")
+
+        self._lock = threading.Lock()
+        self.latency = Histogram()
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+
+    def __call__(self, **kwargs):
+        """Runs the tool (blocking). Async tools get their own event loop in this thread"""
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        failed = False
+        try:
+            if self.is_async:
+                return asyncio.run(self.fn(**kwargs))
+            return self.fn(**kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.errors += failed
+                self.in_flight -= 1
+            self.latency.observe(time.perf_counter() - start)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "latency_s": self.latency.snapshot(),
+        }
+
+
+class ToolRegistry:
+    """
+    Tools register themselves with the @registry.tool decorator.
+    Schemas are built once, at import time; calls go through a dict lookup,
+    so adding a tool never touches the agent's code.
+    """
+    def __init__(self):
+        self._tools = {}
+
+    def tool(self, name=None, description=None, timeout=10, max_concurrency=None, cache_ttl=0):
+        """
+        Decorator.
+        - timeout: seconds before the agent stops waiting for a result
+        - max_concurrency: at most N calls of this tool at once, on its own executor (None = unlimited)
+        - cache_ttl: seconds a result may be reused by the tool cache (0 = never)
+        """
+        def register(fn):
+            tool_name = name or fn.__name__
+            schema = build_schema(fn, tool_name, description)
+            self._tools[tool_name] = Tool(fn, tool_name, schema, timeout, max_concurrency, cache_ttl)
+            return fn
+        return register
+
+    def get(self, name):
+        return self._tools.get(name)
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    def schemas(self):
+        return [t.schema for t in self._tools.values()]
+
+    def call(self, name, args):
+        tool = self._tools.get(name)
+        if tool is None:
+            return f"Error: unknown tool {name}"
+        return tool(**args)
+
+    def stats(self):
+        return {name: t.stats() for name, t in self._tools.items()}
+
+
+# Default registry used by tools.py and AIAgent
+registry = ToolRegistry()
+tool = registry.tool
@@ -0,0 +1,45 @@
+"""
+The agent's tools.
+Each function registers itself (schema included) with @tool; to add a tool,
+write a function here with type hints and a one-line docstring.
+"""
+import json
+from datetime import datetime
+from typing import Annotated
+from ddgs import DDGS
+from tool_registry import tool
+
+
+@tool(timeout=2)
+def get_current_time():
+    """Get the current date and time."""
+    now = datetime.now()
+    return json.dumps({"current_time": now.strftime("%Y-%m-%d %H:%M:%S")})
+
+
+@tool(timeout=5, cache_ttl=600)
+def get_weather(location: Annotated[str, "City name"]):
+    """Get current weather."""
+    # Mock data for demo
+    weather_data = {
+        "rabat": "22°C, Sunny",
+        "london": "15°C, Rainy",
+        "paris": "18°C, Cloudy"
+    }
+    key = location.lower().split(",")[0].strip()
+    result = weather_data.get(key, "Unknown weather data")
+    return json.dumps({"location": location, "weather": result})
+
+
+# DuckDuckGo rate-limits bursts, so only a few searches run at once
+@tool(timeout=15, max_concurrency=4, cache_ttl=3600)
+def search_internet(query: Annotated[str, "The search query"]):
+    """Search the internet for facts."""
+    print(f"   🔎 Internal Search: '{query}'...")
+    # Errors propagate (and become an error result for the model) so they aren't cached
+    results = DDGS().text(query, max_results=3)
+    if not results: return "No results found."
+    summary = ""
+    for r in results:
+        summary += f"- {r['title']}: {r['body']}\n"
+    return summary
@@ -1,10 +1,11 @@
 import chromadb
-from dotenv import load_dotenv
-import os
-from openai import OpenAI
+import sys
+from pathlib import Path
+
+# Shared helpers (cached embeddings, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from embeddings import get_embedding
 
-load_dotenv()
-openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 chroma_client = chromadb.PersistentClient(path="./chroma_db")
 collection = chroma_client.get_or_create_collection(name="knowledge_base")
 
@@ -12,12 +13,8 @@ collection = chroma_client.get_or_create_collection(name="knowledge_base")
 text = "The secret password for the bunker is 'Blueberry'."
 id = "secret_doc"
 
-# Generate embedding
-response = openai_client.embeddings.create(
-    input=text,
-    model="text-embedding-3-small"
-)
-embedding = response.data[0].embedding
+# Generate embedding (cached: re-running the script costs nothing upstream)
+embedding = get_embedding(text)
 
 # Add it to Chroma
 print(f"Adding document: '{text}'")
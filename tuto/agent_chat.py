@@ -1,12 +1,16 @@
-import os
+import sys
+from pathlib import Path
 import json
 from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
 from ddgs import DDGS
 
+# Shared helpers (pooled OpenAI client, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from clients import get_openai_client
+
 load_dotenv()
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+client = get_openai_client()
 
 # --- 1. Define Tools (Same as yesterday) ---
 
@@ -1,10 +1,14 @@
-import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
 import json
 
+# Shared helpers (pooled OpenAI client, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from clients import get_openai_client
+
 load_dotenv()
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+client = get_openai_client()
 
 # 1. Define the Tool (The "Menu" for the AI)
 # We describe what functions are available in a specific JSON format.
@@ -1,8 +1,16 @@
 import streamlit as st
-import chromadb
-import os
 from dotenv import load_dotenv
-from openai import OpenAI
+import sys
+from pathlib import Path
+
+# Shared helpers (cached embeddings, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from embeddings import get_embedding
+from clients import get_openai_client
+from vector_store import get_collection, get_lexical_index
+from retrieval import HybridRetriever
+from rerank import get_reranker
+from rag import RagPipeline
 
 # 1. Configuration & Setup
 st.set_page_config(page_title="My RAG Assistant", page_icon="🤖")
@@ -11,31 +19,24 @@ load_dotenv()
 # Initialize Clients (Cached so they don't reload on every click)
 @st.cache_resource
 def get_clients():
-    openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-    chroma_client = chromadb.PersistentClient(path="./chroma_db")
-    collection = chroma_client.get_collection(name="knowledge_base")
-    return openai_client, collection
-
-openai_client, collection = get_clients()
+    openai_client = get_openai_client()
+    # Chroma by default, or the local mmap store with VECTOR_STORE=local
+    collection = get_collection("knowledge_base")
+    # Vector search + BM25 keyword search, fused by reciprocal rank
+    retriever = HybridRetriever(collection, get_lexical_index("knowledge_base"), get_embedding)
+    # Top candidates -> rerank -> merge overlapping chunks -> pack into a token budget
+    return openai_client, RagPipeline(retriever, get_reranker(collection))
 
-# Helper Functions (Same as yesterday)
-def get_embedding(text):
-    response = openai_client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
+openai_client, pipeline = get_clients()
 
+# Helper Functions (get_embedding now comes from the shared, cached embeddings module)
 def query_database(query_text):
-    results = collection.query(
-        query_embeddings=[get_embedding(query_text)],
-        n_results=1
-    )
-    if not results['documents'][0]:
+    context, sources, _ = pipeline.run(query_text)
+    if not sources:
         return None, None
     
-    # Return both the text AND the source filename
-    return results['documents'][0][0], results['metadatas'][0][0]
+    # Return both the packed passages AND where they come from
+    return context, sources
 
 def generate_answer(query, context):
     prompt = f"""
@@ -49,6 +50,16 @@ def generate_answer(query, context):
     )
     return response.choices[0].message.content
 
+# Streamlit re-runs the script on every interaction: answers are cached per question
+@st.cache_data(ttl=3600, show_spinner=False)
+def answer_question(query):
+    # A. Search
+    retrieved_context, sources = query_database(query)
+    if not retrieved_context:
+        return None, None, None
+    # B. Generate
+    return generate_answer(query, retrieved_context), retrieved_context, sources
+
 # 2. The App Interface
 st.title("🤖 Chat with your PDF")
 st.write("Ask a question about the documents you uploaded.")
@@ -58,19 +69,15 @@ user_query = st.text_input("Enter your question:", placeholder="e.g., What is th
 
 if user_query:
     with st.spinner("Thinking..."):
-        # A. Search
-        retrieved_context, metadata = query_database(user_query)
+        answer, retrieved_context, sources = answer_question(user_query)
         
         if retrieved_context:
-            # B. Generate
-            answer = generate_answer(user_query, retrieved_context)
-            
             # C. Display Result
             st.success("Answer found!")
             st.markdown(f"### 💡 AI Answer:\n{answer}")
             
             # D. Display Source (Transparency)
-            st.info(f"📖 Source: `{metadata['source']}`")
+            st.info("📖 Sources: " + ", ".join(f"[{i}] `{s['label']}`" for i, s in enumerate(sources, start=1)))
             with st.expander("See raw context"):
                 st.write(retrieved_context)
         else:
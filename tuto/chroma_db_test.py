@@ -1,12 +1,12 @@
-import os
 import chromadb
-from dotenv import load_dotenv
-from openai import OpenAI
+import sys
+from pathlib import Path
 
-# 1. Setup
-load_dotenv()
-openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# Shared helpers (cached embeddings, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from embeddings import get_embedding
 
+# 1. Setup
 # Initialize ChromaDB in "Persistent" mode
 # This creates a folder named "chroma_db" in your project to store data
 chroma_client = chromadb.PersistentClient(path="./chroma_db")
@@ -14,14 +14,6 @@ chroma_client = chromadb.PersistentClient(path="./chroma_db")
 # Create (or get) a collection. Think of this like a "Table" in SQL.
 collection = chroma_client.get_or_create_collection(name="knowledge_base")
 
-# Helper function from yesterday
-def get_embedding(text):
-    response = openai_client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
-
 # 2. Add Data to the Database
 # We only want to add data if the collection is empty (to avoid duplicates for this test)
 if collection.count() == 0:
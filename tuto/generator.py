@@ -1,12 +1,15 @@
-import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
 from pydantic import BaseModel
 
+# Shared helpers (pooled OpenAI client, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from clients import get_openai_client
+
 # 1. Load Keys
 load_dotenv()
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+client = get_openai_client()
 
 # 2. Define the Output Structure
 # We want the AI to give us specific sections, not just a blob of text.
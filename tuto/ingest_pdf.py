@@ -1,75 +1,295 @@
 import os
-import chromadb
+import sys
+import argparse
+import time
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from dotenv import load_dotenv
-from openai import OpenAI
 from pypdf import PdfReader
 
+# Shared helpers (cached embeddings, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from embeddings import get_service
+from ingest_manifest import IngestManifest, chunk_hash
+from chunking import chunker_for
+from vector_store import get_collection, get_lexical_index, get_backend, LOCAL_STORE_DIR
+
 # 1. Setup
 load_dotenv()
-openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-collection = chroma_client.get_or_create_collection(name="knowledge_base")
-
-def get_embedding(text):
-    response = openai_client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
-
-def ingest_file(filename):
-    print(f"Reading {filename}...")
-    
-    # A. Read the PDF
+
+EMBED_BATCH_SIZE = 100    # chunks per embeddings.create call
+EMBED_CONCURRENCY = 4     # embedding calls in flight at once
+UPSERT_BATCH_SIZE = 256   # rows per Chroma upsert
+EXTRACT_WORKERS = os.cpu_count() or 1  # processes extracting page text
+PAGES_PER_TASK = 16       # pages per extraction task
+MANIFEST_PATH = "./ingest_manifest.json"  # what has been ingested, next to ./chroma_db
+
+def embed_batch(texts, service=None):
+    """
+    One API call for many chunks. Returns (vectors in input order, tokens used).
+    Chunks embedded before (same text, same model) come from the cache for free.
+    """
+    return (service or get_service()).embed_batch(texts)
+
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_and_store(records, collection, embed=embed_batch, batch_size=EMBED_BATCH_SIZE,
+                    concurrency=EMBED_CONCURRENCY, upsert_batch_size=UPSERT_BATCH_SIZE):
+    """
+    Streaming ingest pipeline.
+    `records` is any iterable of (id, text, metadata). Chunks are grouped into
+    batches, up to `concurrency` batches are embedded at once, and results are
+    upserted into the collection in fixed-size batches as they come back
+    (in input order), so memory stays bounded whatever the document size.
+    Returns throughput stats.
+    """
+    stats = {"chunks": 0, "tokens": 0, "batches": 0, "upserts": 0}
+    ids, documents, embeddings, metadatas = [], [], [], []
+    start = time.perf_counter()
+
+    def flush():
+        collection.upsert(ids=ids[:], documents=documents[:], embeddings=embeddings[:], metadatas=metadatas[:])
+        stats["upserts"] += 1
+        ids.clear(); documents.clear(); embeddings.clear(); metadatas.clear()
+
+    def collect(batch, future):
+        vectors, tokens = future.result()
+        stats["batches"] += 1
+        stats["tokens"] += tokens
+        for (chunk_id, text, metadata), vector in zip(batch, vectors):
+            ids.append(chunk_id)
+            documents.append(text)
+            embeddings.append(vector)
+            metadatas.append(metadata)
+        stats["chunks"] += len(batch)
+        if len(ids) >= upsert_batch_size:
+            flush()
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in _batched(records, batch_size):
+            pending.append((batch, pool.submit(embed, [text for _, text, _ in batch])))
+            # Bounded window: wait for the oldest batch before reading further ahead
+            if len(pending) >= concurrency:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+    if ids:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = elapsed
+    stats["chunks_per_s"] = stats["chunks"] / elapsed if elapsed else 0.0
+    stats["tokens_per_s"] = stats["tokens"] / elapsed if elapsed else 0.0
+    return stats
+
+def _extract_range(filename, start, stop):
+    """Text of pages [start, stop). Runs in a worker process, which opens its own reader"""
+    reader = PdfReader(filename)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def iter_pages(filename, workers=EXTRACT_WORKERS, pages_per_task=PAGES_PER_TASK):
+    """
+    Yields (page_number, text) in page order, page numbers starting at 1.
+    Large documents are split into page ranges extracted in parallel by a
+    process pool (text extraction is CPU-bound, so threads would not help).
+    At most 2 ranges per worker are in flight, so memory stays bounded
+    whatever the page count.
+    """
     reader = PdfReader(filename)
-    full_text = ""
-    for page in reader.pages:
-        full_text += page.extract_text() + "\n"
-        
-    print(f"Total characters extracted: {len(full_text)}")
-
-    # B. Chunk the text
-    # (Simple chunking: every 1000 characters)
-    chunk_size = 1000
-    chunks = []
-    for i in range(0, len(full_text), chunk_size):
-        chunks.append(full_text[i:i+chunk_size])
-        
-    print(f"Created {len(chunks)} chunks.")
-
-    # C. Embed and Store
-    print("Embedding and storing in database... (This may take a moment)")
-    
-    # Prepare lists for Chroma
-    ids = []
-    embeddings = []
-    metadatas = []
-    
-    for idx, chunk in enumerate(chunks):
-        # Create a unique ID for each chunk
-        ids.append(f"{filename}_chunk_{idx}")
-        
-        # Generate vector
-        embeddings.append(get_embedding(chunk))
-        
-        # Store metadata (so we know where this chunk came from later)
-        metadatas.append({"source": filename, "chunk_index": idx})
-
-    # Add to Chroma
-    collection.upsert(
-        ids=ids,
-        documents=chunks,
-        embeddings=embeddings,
-        metadatas=metadatas
-    )
-    print("Success! PDF ingested.")
+    n_pages = len(reader.pages)
+    if workers <= 1 or n_pages <= pages_per_task:
+        for i, page in enumerate(reader.pages):
+            yield i + 1, page.extract_text() or ""
+        return
+    del reader
+
+    ranges = [(start, min(start + pages_per_task, n_pages)) for start in range(0, n_pages, pages_per_task)]
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        for start, stop in ranges:
+            pending.append((start, pool.submit(_extract_range, filename, start, stop)))
+            if len(pending) >= 2 * workers:
+                first, future = pending.popleft()
+                for offset, text in enumerate(future.result()):
+                    yield first + offset + 1, text
+        while pending:
+            first, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                yield first + offset + 1, text
+
+def chunk_records(source, chunks):
+    """
+    (id, text, metadata) per chunk. The id is derived from the chunk's content
+    (plus an occurrence counter for repeated text), so re-ingesting an edited
+    file keeps the ids - and the stored vectors - of every chunk that did not change.
+    """
+    seen = {}
+    for idx, (chunk, first_page, last_page) in enumerate(chunks):
+        digest = chunk_hash(chunk)
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        metadata = {"source": source, "chunk_index": idx, "page": first_page, "page_end": last_page}
+        yield f"{source}#{digest[:16]}-{n}", chunk, metadata
+
+def get_manifest(path=None):
+    # One manifest per backend, kept next to the data it describes
+    if path is None:
+        path = os.path.join(LOCAL_STORE_DIR, "ingest_manifest.json") if get_backend() == "local" else MANIFEST_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return IngestManifest(path)
+
+def ingest_file(filename, collection=None, manifest=None, lexical=None, save=True):
+    """
+    Incremental, idempotent ingest of one PDF.
+    Unchanged file -> nothing to do (size/mtime, then hash check).
+    Changed file -> only new chunks are embedded (and added to the BM25
+    index), chunks that disappeared are deleted, moved chunks only get their
+    metadata updated.
+    Returns {"added", "removed", "moved", "kept"} chunk counts (None if skipped).
+    """
+    collection = collection or get_collection()
+    manifest = manifest or get_manifest()
+    lexical = get_lexical_index() if lexical is None else lexical
+    source = str(filename)
+
+    unchanged, digest = manifest.is_unchanged(source, filename)
+    if unchanged:
+        print(f"Skipping {source} (unchanged)")
+        if save:
+            manifest.save()
+        return None
+
+    print(f"Reading {source}...")
+
+    # A. Where we are: chunk ids (and metadata) already stored for this file
+    entry = manifest.get(source)
+    if entry is None:
+        # First time through the manifest: drop anything stored under the old
+        # position-based ids so the collection matches the manifest exactly
+        collection.delete(where={"source": source})
+        old = {}
+    else:
+        old = entry["chunks"]
+    new = {}
+
+    # B. Read the PDF page by page (in parallel), chunk as pages arrive, and
+    # only pass on chunks that are not stored yet - nothing is held in full
+    def changed_records():
+        for chunk_id, text, metadata in chunk_records(source, chunker_for(filename).chunk(iter_pages(filename))):
+            new[chunk_id] = metadata
+            if chunk_id not in old:
+                lexical.add([chunk_id], [text])
+                yield chunk_id, text, metadata
+
+    # C. Embed and Store only what changed (batched embedding calls, incremental upserts)
+    stats = embed_and_store(changed_records(), collection)
+    pages = max((m["page_end"] for m in new.values()), default=0)
+    print(f"Created {len(new)} chunks from {pages} pages.")
+    if stats["chunks"]:
+        print(f"Embedded {stats['chunks']} new chunks in {stats['seconds']:.1f}s "
+              f"({stats['chunks_per_s']:.1f} chunks/s, {stats['tokens_per_s']:.0f} tokens/s, "
+              f"{stats['batches']} batches, {stats['upserts']} upserts)")
+
+    # D. Drop chunks that disappeared, fix metadata of chunks that moved
+    to_remove = [chunk_id for chunk_id in old if chunk_id not in new]
+    moved = [chunk_id for chunk_id in new if chunk_id in old and old[chunk_id] != new[chunk_id]]
+    if to_remove:
+        collection.delete(ids=to_remove)
+        lexical.delete(to_remove)
+    if moved:
+        collection.update(ids=moved, metadatas=[new[chunk_id] for chunk_id in moved])
+
+    manifest.record(source, filename, digest, new)
+    if save:
+        lexical.save()
+        manifest.save()
+    result = {"added": stats["chunks"], "removed": len(to_remove), "moved": len(moved),
+              "kept": len(new) - stats["chunks"]}
+    print(f"Success! {source}: {result}")
+    return result
+
+def remove_source(source, collection=None, manifest=None, lexical=None):
+    """Deletes every chunk of a file that no longer exists"""
+    collection = collection or get_collection()
+    manifest = manifest or get_manifest()
+    lexical = get_lexical_index() if lexical is None else lexical
+    entry = manifest.forget(source)
+    if entry and entry["chunks"]:
+        collection.delete(ids=list(entry["chunks"]))
+        lexical.delete(list(entry["chunks"]))
+    print(f"Removed {source}")
+
+def sync_folder(folder, collection=None, manifest=None, lexical=None):
+    """
+    Brings the collection in line with every PDF under `folder`:
+    new/changed files are (incrementally) ingested, deleted files are removed.
+    The BM25 index and the manifest are saved once at the end.
+    """
+    collection = collection or get_collection()
+    manifest = manifest or get_manifest()
+    lexical = get_lexical_index() if lexical is None else lexical
+    folder = Path(folder)
+    found = {str(p) for p in sorted(folder.rglob("*.pdf"))}
+
+    for source in sorted(found):
+        try:
+            ingest_file(source, collection, manifest, lexical, save=False)
+        except Exception as e:
+            print(f"Error ingesting {source}: {e}")
+    prefix = str(folder) + os.sep
+    for source in list(manifest.sources):
+        if source.startswith(prefix) and source not in found:
+            remove_source(source, collection, manifest, lexical)
+    lexical.save()
+    manifest.save()
+
+def _snapshot(folder):
+    return {str(p): (st.st_size, st.st_mtime_ns)
+            for p in Path(folder).rglob("*.pdf") for st in [p.stat()]}
+
+def watch_folder(folder, interval=2.0):
+    """Polls `folder` and re-syncs whenever a PDF is added, changed or deleted"""
+    collection = get_collection()
+    manifest = get_manifest()
+    lexical = get_lexical_index()
+    sync_folder(folder, collection, manifest, lexical)
+    last = _snapshot(folder)
+    print(f"Watching {folder} (Ctrl+C to stop)...")
+    try:
+        while True:
+            time.sleep(interval)
+            current = _snapshot(folder)
+            if current != last:
+                sync_folder(folder, collection, manifest, lexical)
+                last = current
+    except KeyboardInterrupt:
+        print("Stopped watching.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally ingest PDFs into the knowledge base")
     # Make sure you have a file named 'sample.pdf' in your folder!
-    # Or change this string to match your file name.
-    target_file = "sample.pdf"
-    
-    if os.path.exists(target_file):
-        ingest_file(target_file)
+    # Or pass another file, or a folder of PDFs.
+    parser.add_argument("target", nargs="?", default="sample.pdf")
+    parser.add_argument("--watch", action="store_true", help="keep polling a folder for changes")
+    parser.add_argument("--interval", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if os.path.isdir(args.target):
+        if args.watch:
+            watch_folder(args.target, args.interval)
+        else:
+            sync_folder(args.target)
+    elif os.path.exists(args.target):
+        ingest_file(args.target)
     else:
-        print(f"Error: Could not find {target_file}")
\ No newline at end of file
+        print(f"Error: Could not find {args.target}")
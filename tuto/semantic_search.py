@@ -1,10 +1,10 @@
-import os
-import math
-from dotenv import load_dotenv
-from openai import OpenAI
+import sys
+from pathlib import Path
 
-load_dotenv()
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# Shared helpers (cached embeddings, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from embeddings import get_embedding, get_embeddings
+from vector_index import VectorIndex
 
 # 1. Our "Database" of knowledge
 # In a real app, this would be your PDF chunks stored in a database.
@@ -15,39 +15,20 @@ documents = [
     "React uses a virtual DOM to optimize rendering.",
 ]
 
-def get_embedding(text):
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
+# 2. Embed every document ONCE (one batched call) into an in-memory index
+# The index keeps normalized vectors in one NumPy matrix, so comparing the
+# query with all documents is a single matrix-vector product.
+index = VectorIndex()
+index.add(documents, get_embeddings(documents))
 
-def cosine_similarity(v1, v2):
-    dot_product = sum(a * b for a, b in zip(v1, v2))
-    magnitude_v1 = math.sqrt(sum(a * a for a in v1))
-    magnitude_v2 = math.sqrt(sum(b * b for b in v2))
-    return dot_product / (magnitude_v1 * magnitude_v2)
-
-def search_database(query):
+def search_database(query, k=1):
     print(f"Analyzing query: '{query}'...")
     
     # A. Convert query to vector
     query_vec = get_embedding(query)
     
-    results = []
-    
-    # B. Loop through every document (The "Retrieval" part)
-    for doc in documents:
-        doc_vec = get_embedding(doc)
-        score = cosine_similarity(query_vec, doc_vec)
-        results.append({
-            "content": doc,
-            "score": score
-        })
-    
-    # C. Sort by highest score
-    # (Lambda explanation: Sort the list based on the 'score' key)
-    results.sort(key=lambda x: x["score"], reverse=True)
+    # B. Score every document at once and keep the best k (The "Retrieval" part)
+    results = [{"content": doc, "score": score} for doc, score in index.search(query_vec, k)]
     
     return results[0]
 
@@ -1,33 +1,36 @@
-import os
-import chromadb
 from dotenv import load_dotenv
-from openai import OpenAI
+import sys
+from pathlib import Path
+
+# Shared helpers (cached embeddings, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from embeddings import get_embedding
+from clients import get_openai_client
+from vector_store import get_collection, get_lexical_index
+from retrieval import HybridRetriever
+from rerank import get_reranker
+from rag import RagPipeline
 
 # 1. Setup
 load_dotenv()
-openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-collection = chroma_client.get_collection(name="knowledge_base")
-
-def get_embedding(text):
-    response = openai_client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
+openai_client = get_openai_client()
+# Chroma by default, or the local mmap store with VECTOR_STORE=local
+collection = get_collection("knowledge_base")
+# Vector search + BM25 keyword search (exact terms: invoice numbers, names), fused by rank
+retriever = HybridRetriever(collection, get_lexical_index("knowledge_base"), get_embedding)
+# Top candidates -> rerank -> merge overlapping chunks -> pack into a token budget
+pipeline = RagPipeline(retriever, get_reranker(collection))
 
 def query_database(query_text):
     # 2. Retrieval (The "R" in RAG)
-    results = collection.query(
-        query_embeddings=[get_embedding(query_text)],
-        n_results=1
-    )
+    context, sources, timings = pipeline.run(query_text)
+    print("Retrieval (ms): " + ", ".join(f"{stage} {ms:.1f}" for stage, ms in timings.items()))
     
     # Check if we actually found something
-    if not results['documents'][0]:
+    if not sources:
         return None
         
-    return results['documents'][0][0]
+    return context
 
 def generate_answer(query, context):
     # 3. Augmented Generation (The "AG" in RAG)
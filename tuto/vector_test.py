@@ -1,18 +1,10 @@
-import os
-import math
-from dotenv import load_dotenv
-from openai import OpenAI
+import sys
+from pathlib import Path
 
-load_dotenv()
-client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-
-def get_embedding(text):
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    # The API returns a list of objects, we want the embedding vector from the first one
-    return response.data[0].embedding
+# Shared helpers (cached embeddings, ...) live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from embeddings import get_embedding
+from vector_index import cosine_similarity
 
 # if __name__ == "__main__":
 #     word = "Apple"
@@ -24,13 +16,8 @@ def get_embedding(text):
 
 # import math
 
-# A manual function to calculate Cosine Similarity
+# Cosine Similarity (vector_index.cosine_similarity, computed with NumPy)
 # (1.0 = Identical, 0.0 = Totally different, -1.0 = Opposite)
-def cosine_similarity(v1, v2):
-    dot_product = sum(a * b for a, b in zip(v1, v2))
-    magnitude_v1 = math.sqrt(sum(a * a for a in v1))
-    magnitude_v2 = math.sqrt(sum(b * b for b in v2))
-    return dot_product / (magnitude_v1 * magnitude_v2)
 
 if __name__ == "__main__":
     # 1. Get vectors for 3 words
@@ -0,0 +1,110 @@
+import json
+import numpy as np
+
+BLOCK_ROWS = 65536  # rows scored per matrix product (bounds temporary memory)
+
+
+def normalize(vectors):
+    """Rows scaled to unit length, as one contiguous float32 matrix"""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2, order="C")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+
+def cosine_similarity(v1, v2):
+    """(1.0 = Identical, 0.0 = Totally different, -1.0 = Opposite)"""
+    a = np.asarray(v1, dtype=np.float32)
+    b = np.asarray(v2, dtype=np.float32)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def _top_k(scores, k):
+    """Indices of the k best scores per row, best first (argpartition, then sort only k)"""
+    if k < scores.shape[1]:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity search in memory.
+    Vectors are normalized once on insert and kept in one contiguous float32
+    matrix, so a query is a matrix-vector product plus an argpartition top-k.
+    Several queries are answered with one matrix-matrix product.
+    Can be saved to .npy and loaded back memory-mapped.
+    """
+    def __init__(self, dim=None, capacity=1024):
+        self.dim = dim
+        self.ids = []
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32) if dim else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def matrix(self):
+        return self._matrix[:len(self.ids)] if self._matrix is not None else np.zeros((0, self.dim or 0), np.float32)
+
+    def add(self, ids, vectors):
+        vectors = normalize(vectors)
+        if self._matrix is None:
+            self.dim = vectors.shape[1]
+            self._matrix = np.zeros((max(1024, len(vectors)), self.dim), dtype=np.float32)
+        n, m = len(self.ids), len(vectors)
+        if n + m > len(self._matrix) or not self._matrix.flags.writeable:
+            # Grow by doubling (also copies a read-only mmap into memory)
+            grown = np.zeros((max(2 * len(self._matrix), n + m), self.dim), dtype=np.float32)
+            grown[:n] = self._matrix[:n]
+            self._matrix = grown
+        self._matrix[n:n + m] = vectors
+        self.ids.extend(ids)
+
+    def search_batch(self, queries, k=5):
+        """[(id, score), ...] best first, for each query"""
+        queries = normalize(queries)
+        n = len(self.ids)
+        if n == 0:
+            return [[] for _ in queries]
+        k = min(k, n)
+        best_idx = best_scores = None
+        # Score in blocks of rows, keep the running top k (works on mmaps bigger than RAM)
+        for start in range(0, n, BLOCK_ROWS):
+            block = self._matrix[start:min(start + BLOCK_ROWS, n)]
+            idx, scores = _top_k(queries @ block.T, min(k, len(block)))
+            idx = idx + start
+            if best_idx is not None:
+                idx = np.concatenate([best_idx, idx], axis=1)
+                scores = np.concatenate([best_scores, scores], axis=1)
+                keep, scores = _top_k(scores, k)
+                idx = np.take_along_axis(idx, keep, axis=1)
+            best_idx, best_scores = idx, scores
+        return [
+            [(self.ids[i], float(s)) for i, s in zip(row_idx, row_scores)]
+            for row_idx, row_scores in zip(best_idx, best_scores)
+        ]
+
+    def search(self, query, k=5):
+        return self.search_batch([query], k)[0]
+
+    # --- Persistence: <path>.npy (vectors) + <path>.ids.json ---
+    def save(self, path):
+        np.save(f"{path}.npy", self.matrix)
+        with open(f"{path}.ids.json", "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """mmap=True maps the vectors read-only instead of reading them into memory"""
+        matrix = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+        with open(f"{path}.ids.json", encoding="utf-8") as f:
+            ids = json.load(f)
+        index = cls(dim=matrix.shape[1], capacity=0)
+        index._matrix = matrix
+        index.ids = ids
+        return index
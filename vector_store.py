@@ -0,0 +1,422 @@
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from vector_index import normalize, BLOCK_ROWS
+
+# Files of a LocalVectorStore directory
+HEADER = "header.json"        # {"dim", "dtype", "metadata"}
+VECTORS = "vectors.bin"       # one row per record: float32, or int8 (+ a float32 scale in scales.bin)
+SCALES = "scales.bin"
+RECORDS = "records.jsonl"     # metadata sidecar: {"id", "document", "metadata"} per row
+OFFSETS = "offsets.bin"       # uint64 byte offset of each row in records.jsonl (written last = commit)
+IDS = "ids.jsonl"             # row -> id, loaded at open
+TOMBSTONES = "tombstones.bin"  # int64 numbers of deleted rows
+
+INT8_BLOCK_ROWS = 4096
+
+
+def _matches(metadata, where):
+    """Chroma-style equality filter: {"source": "a.pdf"} or {"$and": [...]}"""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(_matches(metadata, w) for w in where["$and"])
+    for key, value in where.items():
+        if isinstance(value, dict):
+            value = value.get("$eq")
+        if (metadata or {}).get(key) != value:
+            return False
+    return True
+
+
+class LocalVectorStore:
+    """
+    Lightweight stand-in for a Chroma collection (same upsert/query/get/
+    update/delete/count calls), for brute-force top-k over local files.
+
+    Everything is append-only: vectors go to a memory-mapped file (float32,
+    or int8 with a per-row scale), documents and metadata to a JSONL sidecar
+    read only for the rows a query returns. Deletes and overwrites just
+    tombstone the old row; compact() rewrites the files without them.
+    Opening a store only reads the ids, so cold start is fast and memory
+    grows with the pages actually touched.
+    Distances are cosine distances (1 - cosine similarity).
+    """
+    def __init__(self, path, dtype="float32"):
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path))
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._open(dtype)
+
+    # --- Files ---
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open(self, dtype):
+        if os.path.exists(self._file(HEADER)):
+            with open(self._file(HEADER), encoding="utf-8") as f:
+                header = json.load(f)
+            self.dim, self.dtype = header["dim"], header["dtype"]
+            self.metadata = header.get("metadata")
+        else:
+            self.dim, self.dtype, self.metadata = None, dtype, None
+        if self.dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported dtype {self.dtype}")
+
+        offsets = self._file(OFFSETS)
+        n = os.path.getsize(offsets) // 8 if os.path.exists(offsets) else 0
+        self._ids = []
+        ids_end = 0
+        if n:
+            with open(self._file(IDS), "rb") as f:
+                for line in f:
+                    self._ids.append(json.loads(line))
+                    ids_end += len(line)
+                    if len(self._ids) == n:
+                        break
+        self._truncate_to(n, ids_end)
+        self._live = np.ones(n, dtype=bool)
+        if os.path.exists(self._file(TOMBSTONES)):
+            dead = np.fromfile(self._file(TOMBSTONES), dtype=np.int64)
+            self._live[dead[dead < n]] = False
+        self._row_of = {self._ids[row]: row for row in np.flatnonzero(self._live)}
+        self._mapped = {}  # file name -> (rows, memmap)
+
+    def _truncate_to(self, n, ids_end):
+        """
+        Cuts every file back to the first n rows (the committed ones). Anything
+        after them is an interrupted write; left in place, the next append
+        would land after it and misalign every row.
+        """
+        records_end = 0
+        if n:
+            with open(self._file(RECORDS), "rb") as f:
+                f.seek(int(np.fromfile(self._file(OFFSETS), dtype=np.uint64, count=n, offset=(n - 1) * 8)[0]))
+                records_end = f.tell() + len(f.readline())
+        sizes = {
+            OFFSETS: n * 8,
+            VECTORS: n * (self.dim or 0) * np.dtype(self.dtype).itemsize,
+            SCALES: n * 4 if self.dtype == "int8" else 0,
+            RECORDS: records_end,
+            IDS: ids_end,
+        }
+        for name, size in sizes.items():
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _map(self, name, dtype, width):
+        """Read-only memmap of the first len(self._ids) rows (re-mapped after appends)"""
+        n = len(self._ids)
+        rows, mapped = self._mapped.get(name, (None, None))
+        if rows != n:
+            shape = (n, width) if width else (n,)
+            mapped = np.memmap(self._file(name), dtype=dtype, mode="r", shape=shape) if n else np.zeros(shape, dtype)
+            self._mapped[name] = (n, mapped)
+        return mapped
+
+    def _write_header(self):
+        tmp = self._file(HEADER + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "metadata": self.metadata}, f)
+        os.replace(tmp, self._file(HEADER))
+
+    def _vectors(self):
+        return self._map(VECTORS, self.dtype, self.dim)
+
+    def _scales(self):
+        return self._map(SCALES, np.float32, None)
+
+    def _offsets(self):
+        return self._map(OFFSETS, np.uint64, None)
+
+    def _record(self, row):
+        with open(self._file(RECORDS), "rb") as f:
+            f.seek(int(self._offsets()[row]))
+            return json.loads(f.readline())
+
+    def _vector(self, row):
+        vector = np.asarray(self._vectors()[row], dtype=np.float32)
+        return vector * self._scales()[row] if self.dtype == "int8" else vector
+
+    # --- Writes ---
+    def _append(self, ids, vectors, documents, metadatas):
+        """Appends rows; earlier rows with the same ids are tombstoned"""
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._write_header()
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+        with open(self._file(VECTORS), "ab") as f:
+            if self.dtype == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127
+                scales[scales == 0] = 1
+                np.round(vectors / scales[:, None]).astype(np.int8).tofile(f)
+                with open(self._file(SCALES), "ab") as s:
+                    scales.astype(np.float32).tofile(s)
+            else:
+                vectors.tofile(f)
+
+        offsets = []
+        with open(self._file(RECORDS), "ab") as f:
+            for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                offsets.append(f.tell())
+                f.write(json.dumps({"id": chunk_id, "document": document, "metadata": metadata},
+                                   ensure_ascii=False).encode("utf-8") + b"\n")
+        with open(self._file(IDS), "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(chunk_id) + "\n" for chunk_id in ids)
+        with open(self._file(OFFSETS), "ab") as f:
+            np.asarray(offsets, dtype=np.uint64).tofile(f)
+
+        first = len(self._ids)
+        self._ids.extend(ids)
+        self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+        dead = []
+        for row, chunk_id in enumerate(ids, start=first):
+            if chunk_id in self._row_of:
+                dead.append(self._row_of[chunk_id])
+            self._row_of[chunk_id] = row
+        self._tombstone(dead)
+
+    def _tombstone(self, rows):
+        if not rows:
+            return
+        with open(self._file(TOMBSTONES), "ab") as f:
+            np.asarray(rows, dtype=np.int64).tofile(f)
+        self._live[rows] = False
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None):
+        if embeddings is None:
+            raise ValueError("LocalVectorStore needs embeddings (it does not embed documents itself)")
+        if not ids:
+            return
+        with self._lock:
+            self._append(list(ids), normalize(embeddings),
+                         documents or [None] * len(ids), metadatas or [None] * len(ids))
+
+    add = upsert
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        """Rewrites the given fields of existing rows (as new rows)"""
+        with self._lock:
+            keep = [(k, chunk_id) for k, chunk_id in enumerate(ids) if chunk_id in self._row_of]
+            if not keep:
+                return
+            rows = [self._row_of[chunk_id] for _, chunk_id in keep]
+            records = [self._record(row) for row in rows]
+            vectors = (normalize([embeddings[k] for k, _ in keep]) if embeddings is not None
+                       else np.stack([self._vector(row) for row in rows]))
+            self._append(
+                [chunk_id for _, chunk_id in keep], vectors,
+                [documents[k] if documents is not None else r["document"] for (k, _), r in zip(keep, records)],
+                [metadatas[k] if metadatas is not None else r["metadata"] for (k, _), r in zip(keep, records)],
+            )
+
+    def _rows(self, ids=None, where=None):
+        """Live rows matching ids and/or a metadata filter (a filter reads the sidecar)"""
+        if ids is not None:
+            rows = [self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of]
+        else:
+            rows = [int(row) for row in np.flatnonzero(self._live)]
+        if where and rows:
+            wanted = set(rows)
+            rows = [row for row, record in self._scan() if row in wanted and _matches(record["metadata"], where)]
+        return rows
+
+    def _scan(self):
+        """(row, record) for every committed row, reading the sidecar once, in order"""
+        with open(self._file(RECORDS), "rb") as f:
+            for row in range(len(self._ids)):
+                yield row, json.loads(f.readline())
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            rows = self._rows(ids, where)
+            for row in rows:
+                del self._row_of[self._ids[row]]
+            self._tombstone(rows)
+
+    def modify(self, metadata):
+        """Replaces the collection metadata (like Chroma's collection.modify)"""
+        with self._lock:
+            self.metadata = dict(metadata)
+            self._write_header()
+
+    # --- Reads ---
+    def count(self):
+        return len(self._row_of)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        with self._lock:
+            start = offset or 0
+            rows = self._rows(ids, where)[start:start + limit if limit else None]
+            records = [self._record(row) for row in rows]
+            result = {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [r["document"] for r in records],
+                "metadatas": [r["metadata"] for r in records],
+            }
+            if include and "embeddings" in include:
+                result["embeddings"] = [self._vector(row).tolist() for row in rows]
+            return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        queries = normalize(query_embeddings)
+        with self._lock:
+            n = len(self._ids)
+            mask = self._live
+            if where:
+                mask = np.zeros(n, dtype=bool)
+                mask[self._rows(where=where)] = True
+            k = min(n_results, int(mask.sum()))
+            if k == 0:
+                return {key: [[] for _ in queries] for key in ("ids", "documents", "metadatas", "distances")}
+
+            vectors = self._vectors()
+            scales = self._scales() if self.dtype == "int8" else None
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+            # Score in blocks so only the touched part of the file is paged in at a time
+            # (int8 blocks are upcast to float32, so keep those small)
+            block = BLOCK_ROWS if scales is None else INT8_BLOCK_ROWS
+            for start in range(0, n, block):
+                stop = min(start + block, n)
+                scores = queries @ np.asarray(vectors[start:stop], dtype=np.float32).T
+                if scales is not None:
+                    scores *= scales[start:stop]
+                scores[:, ~mask[start:stop]] = -np.inf
+                rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+                scores = np.concatenate([best_scores, scores], axis=1)
+                rows = np.concatenate([best_rows, rows], axis=1)
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else \
+                    np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+                best_scores = np.take_along_axis(scores, top, axis=1)
+                best_rows = np.take_along_axis(rows, top, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+            result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            for rows, scores in zip(best_rows, best_scores):
+                records = [self._record(row) for row in rows]
+                result["ids"].append([self._ids[row] for row in rows])
+                result["documents"].append([r["document"] for r in records])
+                result["metadatas"].append([r["metadata"] for r in records])
+                result["distances"].append([float(1 - s) for s in scores])
+            return result
+
+    # --- Maintenance ---
+    def compact(self):
+        """Rewrites the store without tombstoned rows. Returns the number of rows dropped"""
+        with self._lock:
+            dropped = len(self._ids) - self.count()
+            if not dropped:
+                return 0
+            tmp = f"{self.path}.compact"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            rows = np.flatnonzero(self._live)
+            shutil.copy(self._file(HEADER), os.path.join(tmp, HEADER))
+            with open(os.path.join(tmp, VECTORS), "wb") as f:
+                for i in range(0, len(rows), BLOCK_ROWS):
+                    np.asarray(self._vectors()[rows[i:i + BLOCK_ROWS]]).tofile(f)
+            if self.dtype == "int8":
+                with open(os.path.join(tmp, SCALES), "wb") as f:
+                    np.asarray(self._scales()[rows]).tofile(f)
+            offsets = []
+            with open(os.path.join(tmp, RECORDS), "wb") as out, open(self._file(RECORDS), "rb") as src:
+                for row in rows:
+                    src.seek(int(self._offsets()[row]))
+                    offsets.append(out.tell())
+                    out.write(src.readline())
+            with open(os.path.join(tmp, IDS), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(self._ids[row]) + "\n" for row in rows)
+            with open(os.path.join(tmp, OFFSETS), "wb") as f:
+                np.asarray(offsets, dtype=np.uint64).tofile(f)
+
+            self._mapped.clear()  # release the old memmaps before replacing the files
+            for name in (VECTORS, SCALES, RECORDS, IDS, OFFSETS):
+                if os.path.exists(os.path.join(tmp, name)):
+                    os.replace(os.path.join(tmp, name), self._file(name))
+            if os.path.exists(self._file(TOMBSTONES)):
+                os.remove(self._file(TOMBSTONES))
+            shutil.rmtree(tmp, ignore_errors=True)
+            self._open(self.dtype)
+            return dropped
+
+    def stats(self):
+        size = sum(os.path.getsize(self._file(name)) for name in os.listdir(self.path))
+        return {"rows": len(self._ids), "live": self.count(), "dead": len(self._ids) - self.count(),
+                "dtype": self.dtype, "dim": self.dim, "disk_bytes": size}
+
+
+# --- Backend selection for the RAG scripts ---
+LOCAL_STORE_DIR = "./vector_store"
+
+
+def get_backend():
+    """VECTOR_STORE=chroma (default) or local; read at call time, after load_dotenv()"""
+    return os.environ.get("VECTOR_STORE", "chroma")
+
+
+def check_embedding(collection, embedding):
+    """
+    Records the embedding provider, model and dimension on a collection that
+    has none; raises ValueError when the collection was built with another
+    model (its vectors would be compared with incompatible query vectors).
+    """
+    recorded = collection.metadata or {}
+    if recorded.get("embedding_model") is None:
+        # Built before models were recorded: at least the dimension of a stored vector must match
+        sample = collection.get(limit=1, include=["embeddings"])
+        if len(sample["ids"]) and embedding.get("embedding_dim") not in (None, len(sample["embeddings"][0])):
+            raise ValueError(
+                f"Collection {collection.name!r} holds {len(sample['embeddings'][0])}-dim vectors but the "
+                f"embedding provider {embedding['embedding_model']} returns {embedding['embedding_dim']}."
+            )
+        # Chroma keeps hnsw:* settings apart and refuses them in modify()
+        kept = {k: v for k, v in recorded.items() if not k.startswith("hnsw:")}
+        collection.modify(metadata={**kept, **{k: v for k, v in embedding.items() if v is not None}})
+        return
+    for key in ("embedding_model", "embedding_dim"):
+        if embedding.get(key) is not None and recorded.get(key) not in (None, embedding[key]):
+            raise ValueError(
+                f"Collection {collection.name!r} was built with {recorded['embedding_model']} "
+                f"({recorded.get('embedding_dim')} dims) but the embedding provider is "
+                f"{embedding['embedding_model']} ({embedding.get('embedding_dim')} dims). "
+                "Re-ingest into a new collection or switch EMBEDDING_PROVIDER back."
+            )
+
+
+def get_collection(name="knowledge_base", backend=None, embedding=None):
+    """
+    The knowledge base collection: Chroma in ./chroma_db, or a LocalVectorStore in ./vector_store/<name>.
+    `embedding` (default: the configured embedding service's describe()) is recorded on a new
+    collection and checked against an existing one.
+    """
+    if (backend or get_backend()) == "local":
+        dtype = os.environ.get("LOCAL_STORE_DTYPE", "float32")  # "float32" or "int8"
+        collection = LocalVectorStore(os.path.join(LOCAL_STORE_DIR, name), dtype=dtype)
+    else:
+        import chromadb  # only needed for the Chroma backend
+        collection = chromadb.PersistentClient(path="./chroma_db").get_or_create_collection(name=name)
+    if embedding is None:
+        from embeddings import get_service
+        embedding = get_service().describe()
+    check_embedding(collection, embedding)
+    return collection
+
+
+def get_lexical_index(name="knowledge_base", backend=None):
+    """The BM25 index kept next to the collection: ./vector_store/<name>.bm25.npz or ./bm25_index/<name>.npz"""
+    from bm25 import BM25Index
+    if (backend or get_backend()) == "local":
+        path = os.path.join(LOCAL_STORE_DIR, f"{name}.bm25.npz")
+    else:
+        path = os.path.join("./bm25_index", f"{name}.npz")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return BM25Index(path)